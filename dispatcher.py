@@ -0,0 +1,102 @@
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+import numpy as np
+
+from inference import predict_columns
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceDispatcher:
+    # Sammelt Vorhersage-Anfragen aller Sessions für höchstens max_wait Sekunden bzw. max_batch Anfragen,
+    # gruppiert sie nach Modell (pro Parkplatz ein Modell -> nach Parkplatz) und rechnet je Gruppe einen
+    # predict-Aufruf. Die Ergebnisse gehen über Futures an die wartenden Sessions zurück.
+
+    def __init__(self, max_batch=256, max_wait=0.002, engine="xgboost"):
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.engine = engine
+        self._queue = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.batch_sizes = Counter()         # Gruppengröße -> Anzahl predict-Aufrufe
+        self._queue_times = deque(maxlen=1000)   # Sekunden von submit bis Start der Vorhersage
+        self._thread = threading.Thread(target=self._run, name="inference-dispatcher", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def submit(self, model, columns, row):
+        # columns: Spalten aus LotFeatureTable.columns, row: Zeilenindex darin
+        future = Future()
+        self._queue.put((model, columns, row, future, time.perf_counter()))
+        return future
+
+    def _run(self):
+        while True:
+            request = self._queue.get()
+            if request is None:
+                return
+            pending = [request]
+            # Die Wartezeit zählt ab der ältesten Anfrage, nicht ab dem Ende des vorigen Batches
+            deadline = request[4] + self.max_wait
+            while len(pending) < self.max_batch:
+                try:
+                    request = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self._queue.put(None)
+                    break
+                pending.append(request)
+            self._dispatch(pending)
+
+    def _dispatch(self, pending):
+        started = time.perf_counter()
+        groups = {}
+        for request in pending:
+            groups.setdefault(id(request[0]), []).append(request)
+        for requests in groups.values():
+            futures = [request[3] for request in requests]
+            try:
+                first = requests[0][1]
+                columns = {name: np.array([cols[name][row] for _, cols, row, _, _ in requests], dtype=values.dtype)
+                           for name, values in first.items()}
+                predictions = predict_columns(requests[0][0], columns, slice(None), self.engine)
+            except Exception as exc:
+                logger.exception("Batched prediction failed")
+                for future in futures:
+                    future.set_exception(exc)
+                continue
+            for future, prediction in zip(futures, predictions):
+                future.set_result(prediction)
+        with self._lock:
+            self.requests += len(pending)
+            self.batch_sizes.update(len(requests) for requests in groups.values())
+            self._queue_times.extend(started - request[4] for request in pending)
+
+    def stats(self):
+        with self._lock:
+            batches = sum(self.batch_sizes.values())
+            queue_ms = np.array(self._queue_times) * 1000
+            return {
+                "requests": self.requests,
+                "batches": batches,
+                "mean_batch_size": self.requests / batches if batches else None,
+                "max_batch_size": max(self.batch_sizes) if batches else None,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "queue_ms_mean": float(queue_ms.mean()) if len(queue_ms) else None,
+                "queue_ms_p95": float(np.percentile(queue_ms, 95)) if len(queue_ms) else None,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000,
+            }
@@ -1,20 +1,135 @@
 import streamlit as st
-import pickle
-import glob
-from datetime import datetime, timedelta, date, timezone
+from datetime import datetime, timedelta, timezone
 import pytz
-import holidays
+import numpy as np
 import pandas as pd
 import pydeck as pdk
-import requests
 
 from mappings import *
+from dispatcher import InferenceDispatcher
+from features import lot_feature_table, time_features
+from forecast_grid import ForecastScheduler
+from global_model import GLOBAL_MODEL_PREFIX
+from horizon import horizon_slots, slot_start, sweep
+from inference import clip_prediction, configure_policy, predict_columns
+from model_registry import ModelRegistry
+from prediction_cache import PredictionCache, model_fingerprint, prediction_key
+from scenarios import BASELINE, WEATHER_SCENARIOS, distinguishes_event_size, scenario_labels, scenario_table
+from singleflight import single_flight
+from settings import (FORECAST_GRID_INTERVAL, MODEL_BUNDLE, MODEL_CITY, MODEL_DIR, MODEL_FORMAT, MODEL_MEMORY_BUDGET_MB,
+                      MODEL_MODE, MODEL_PIN_SECONDS, MODEL_QUARANTINE_BACKOFF, MODEL_QUARANTINE_MAX_BACKOFF,
+                      MODEL_RELOAD_INTERVAL, MODEL_SETTLE_SECONDS, PREDICT_BATCH_MAX_SIZE,
+                      PREDICT_BATCH_MAX_WAIT_MS, PREDICT_ENGINE, PREDICT_MAX_CONCURRENCY, PREDICT_NTHREAD,
+                      PREDICTION_CACHE_PATH, PREDICTION_CACHE_TTL, WEATHER_BACKOFF, WEATHER_BASE_URL,
+                      WEATHER_CELL_DEGREES, WEATHER_FIXTURE, WEATHER_PREFETCH_INTERVAL, WEATHER_PREFETCH_JITTER,
+                      WEATHER_PROVIDER, WEATHER_RETRIES, WEATHER_RETRY_AFTER, WEATHER_TIMEOUT, WEATHER_TTL)
+from warmup import ModelWarmup
+from weather import OpenMeteoProvider, WeatherClient, lot_locations
+from weather_replay import ReplayProvider
 
 st.set_page_config(page_title="Dresden Parking", layout="wide")
 
+# Threads pro predict-Aufruf und gleichzeitige Aufrufe im Prozess begrenzen, bevor das Warm-up rechnet
+@st.cache_resource
+def get_inference_policy():
+    return configure_policy(PREDICT_NTHREAD, PREDICT_MAX_CONCURRENCY)
+
+inference_policy = get_inference_policy()
+
+# --- Modell-Registry (einmal pro Prozess, von allen Sessions geteilt) ---
+# Neue/geänderte/gelöschte Modelldateien werden im Hintergrund erkannt und atomar getauscht.
+# Beim Start lädt ein Warm-up alle Modelle und rechnet je eine synthetische Vorhersage.
+@st.cache_resource
+def get_model_warmup():
+    if MODEL_MODE == "global":
+        # Globales Modell liegt als xgb_global_<stadt>.ubj neben den Parkplatz-Modellen
+        registry = ModelRegistry(MODEL_DIR, model_format="native", settle_seconds=MODEL_SETTLE_SECONDS,
+                                 quarantine_backoff=MODEL_QUARANTINE_BACKOFF,
+                                 quarantine_max_backoff=MODEL_QUARANTINE_MAX_BACKOFF, prefix=GLOBAL_MODEL_PREFIX)
+    else:
+        registry = ModelRegistry(MODEL_DIR, model_format=MODEL_FORMAT, settle_seconds=MODEL_SETTLE_SECONDS,
+                                 bundle_path=MODEL_BUNDLE, quarantine_backoff=MODEL_QUARANTINE_BACKOFF,
+                                 quarantine_max_backoff=MODEL_QUARANTINE_MAX_BACKOFF,
+                                 memory_budget=int(MODEL_MEMORY_BUDGET_MB * 1024 * 1024))
+    return ModelWarmup(registry, PREDICT_ENGINE, MODEL_RELOAD_INTERVAL).start()
+
+warmup = get_model_warmup()
+if not warmup.ready:
+    # Leichter Platzhalter, bis alle Modelle geladen und aufgewärmt sind
+    warmup_placeholder = st.empty()
+    while not warmup.wait(0.5):
+        warmup_placeholder.info(f"⏳ Warming up prediction models … ({warmup.loaded} loaded)")
+    warmup_placeholder.empty()
+
+def lot_models(snapshot_models):
+    # Parkplatz-Key -> Modell; im globalen Modus dasselbe Modell für alle Parkplätze
+    if MODEL_MODE != "global":
+        return snapshot_models
+    global_model = snapshot_models.get(MODEL_CITY)
+    return {key: global_model for key in name_mapping} if global_model is not None else {}
+
+# Wetter für alle Sessions: ein Hintergrund-Thread lädt es regelmäßig neu und speist auch das Vorhersage-Raster
+@st.cache_resource
+def get_weather_client():
+    # Wetter pro Parkplatz; Parkplätze in derselben Rasterzelle teilen sich eine Reihe, eine Anfrage für alle Zellen
+    if WEATHER_PROVIDER == "replay":
+        provider = ReplayProvider(WEATHER_FIXTURE)
+    else:
+        provider = OpenMeteoProvider(WEATHER_BASE_URL)
+    client = WeatherClient(provider, ttl=WEATHER_TTL, timeout=WEATHER_TIMEOUT, retries=WEATHER_RETRIES,
+                           backoff=WEATHER_BACKOFF, locations=lot_locations(name_mapping),
+                           cell_degrees=WEATHER_CELL_DEGREES, retry_after=WEATHER_RETRY_AFTER)
+    return client.start_prefetch(WEATHER_PREFETCH_INTERVAL, WEATHER_PREFETCH_JITTER)
+
+weather_client = get_weather_client()
+
+# --- Vorhersage-Raster ohne Event, im Hintergrund alle FORECAST_GRID_INTERVAL Minuten neu berechnet ---
+@st.cache_resource
+def get_forecaster(_registry):
+    if FORECAST_GRID_INTERVAL <= 0:
+        return None
+    return ForecastScheduler(_registry, lot_models, FORECAST_GRID_INTERVAL * 60, PREDICT_ENGINE,
+                             weather=weather_client).start()
+
+forecaster = get_forecaster(warmup.registry)
+
+# Geteilter Cache für Einzelvorhersagen (alle Sessions); greift vor allem bei Events und ohne Raster
+@st.cache_resource
+def get_prediction_cache():
+    return PredictionCache(PREDICTION_CACHE_TTL, PREDICTION_CACHE_PATH or None)
+
+prediction_cache = get_prediction_cache()
+
+# Sammelt Einzelvorhersagen aller Sessions für wenige Millisekunden und rechnet sie pro Parkplatz gebündelt
+@st.cache_resource
+def get_dispatcher():
+    if PREDICT_BATCH_MAX_WAIT_MS <= 0:
+        return None
+    return InferenceDispatcher(PREDICT_BATCH_MAX_SIZE, PREDICT_BATCH_MAX_WAIT_MS / 1000, PREDICT_ENGINE).start()
+
+dispatcher = get_dispatcher()
+
+# Snapshot für diesen Rerun; ein Reload währenddessen betrifft erst den nächsten Rerun.
+# Defekte Modelle liegen in Quarantäne und erscheinen auf der Karte als "unavailable".
+snapshot_models, unavailable_lots = warmup.registry.snapshot()
+model_version = warmup.registry.version
+models = lot_models(snapshot_models)
+global_model = None
+if MODEL_MODE == "global":
+    global_model = snapshot_models.get(MODEL_CITY)
+    if global_model is not None:
+        unavailable_lots = {}
+    else:
+        unavailable_lots = {key: unavailable_lots.get(MODEL_CITY, "Global model missing") for key in name_mapping}
+# Modellstand pro Parkplatz für den Vorhersage-Cache (gleich in allen Prozessen, anders als model_version)
+model_fingerprints = {key: model_fingerprint(MODEL_MODE, snapshot_models.entry(MODEL_CITY if global_model is not None else key)[0])
+                      for key in models}
+
+# Anzahl Parkplätze pro Block, nach dem KPIs und Karte aktualisiert werden
+RENDER_CHUNK_SIZE = 8
+
 # --- Parkplatznamen und Mapping auf Eingabewerte ---
-pkl_files = glob.glob("xgb_model_*.pkl")
-parking_names = [f.replace("xgb_model_", "").replace(".pkl", "") for f in pkl_files]
+parking_names = list(models)
 parking_display_names = [name_mapping.get(p, p) for p in parking_names]
 
 # --- UI: Titel & Eingaben ---
@@ -35,7 +150,10 @@ with col_time:
 
 with col_event:
     selected_parking_display = st.selectbox("Select parking lot", parking_display_names)
-    selected_parking = parking_names[parking_display_names.index(selected_parking_display)]
+    selected_parking = parking_names[parking_display_names.index(selected_parking_display)] if parking_names else None
+    if selected_parking is not None and global_model is None:
+        # Auswahl dieser Session im Modell-Cache halten, auch bei knappem Speicherbudget
+        warmup.registry.pin(selected_parking, MODEL_PIN_SECONDS)
 
     in_event_window = st.toggle("Event in 600 m radius?", value=False)
     if in_event_window:
@@ -49,160 +167,228 @@ with col_event:
     else:
         event_size = None
 
-# --- Wetterdaten (Vorhersage angepasst an prediction_time) ---
-weather_url = (
-    "https://api.open-meteo.com/v1/forecast"
-    "?latitude=51.0504&longitude=13.7373"
-    "&hourly=temperature_2m,weathercode,precipitation,relativehumidity_2m"
-    "&forecast_days=3"
-    "&timezone=auto"
-)
-response = requests.get(weather_url)
-weather_data = response.json()
-
-hourly_times = weather_data.get("hourly", {}).get("time", [])
-temp_series = weather_data.get("hourly", {}).get("temperature_2m", [])
-weather_series = weather_data.get("hourly", {}).get("weathercode", [])
-rain_series = weather_data.get("hourly", {}).get("precipitation", [])
-humidity_series = weather_data.get("hourly", {}).get("relativehumidity_2m", [])
-
-pred_time_str = prediction_time.strftime("%Y-%m-%dT%H:00")
-if pred_time_str in hourly_times:
-    idx = hourly_times.index(pred_time_str)
-    temperature_api = temp_series[idx]
-    weather_code = weather_series[idx]
-    rain_api = rain_series[idx]
-    humidity_api = humidity_series[idx]
-else:
-    temperature_api = weather_data.get("current_weather", {}).get("temperature", 10)
-    weather_code = weather_data.get("current_weather", {}).get("weathercode", 0)
-    rain_api = 0.0
-    humidity_api = 50.0
-
-description_auto = weather_code_mapping.get(weather_code, "Unknown")
-sachsen_holidays = holidays.Germany(prov='SN')
+# --- Wetterdaten (Vorhersage auf prediction_time interpoliert) ---
+# Ein Wetterstand pro Rerun: Karte, Kurve und gewählter Parkplatz nutzen denselben Abruf
+weather_snapshot = weather_client.current()
+weather_series = weather_client.series(selected_parking, weather_snapshot)
+
+weather = weather_series.at(prediction_time)
+if not weather_series.covers([prediction_time])[0]:
+    st.warning("No weather forecast available for the selected time, using default weather.")
 
 # --- Zeitbasierte Variablen ---
-hour = prediction_time.hour
-minute_of_day = prediction_time.hour * 60 + prediction_time.minute
-weekday = prediction_time.weekday()
-is_weekend = 1 if weekday >= 5 else 0
-is_holiday = 1 if date(prediction_time.year, prediction_time.month, prediction_time.day) in sachsen_holidays else 0
-
-def get_occupancy_value(parking_key, minute_of_day):
-    mapped_name = name_mapping.get(parking_key, parking_key)
-    if mapped_name not in occupancy_mapping:
-        return 50.0
-    rounded_minute = str(5 * round(minute_of_day / 5))
-    return occupancy_mapping[mapped_name].get(rounded_minute, 50.0)
-
-# --- Modelle laden und Vorhersagen berechnen ---
-results = []
-selected_prediction = None
-for model_file, key in zip(pkl_files, parking_names):
-    try:
-        with open(model_file, "rb") as f:
-            model = pickle.load(f)
-    except (EOFError, pickle.UnpicklingError):
-        placeholder = st.empty()
-        placeholder.info("An error occurred and the application was restarted.")
-        st.experimental_rerun()
-
-    model_name_value = name_mapping.get(key, key)
-    inputs = {
-        "Name": model_name_value,
-        "Capacity": float(capacity_mapping.get(key, 0)),
-        "Temperature": float(temperature_api),
-        "Description": description_auto,
-        "Humidity": float(humidity_api),
-        "Rain": float(rain_api),
-        "District": district_mapping.get(key, "Unbekannt"),
-        "Type": type_mapping.get(model_name_value, "Unbekannt"),
-        "final_avg_occ": float(get_occupancy_value(key, minute_of_day)),
-        "in_event_window": int(in_event_window if key == selected_parking else 0),
-        "event_size": event_size if key == selected_parking else None,
-        "distance_to_nearest_parking": float(distance_mapping.get(model_name_value, 0.0)),
-        "hour": float(hour),
-        "minute_of_day": float(minute_of_day),
-        "weekday": float(weekday),
-        "is_weekend": float(is_weekend),
-        "is_holiday": float(is_holiday)
-    }
-    feature_order = list(model.feature_names_in_) if hasattr(model, "feature_names_in_") else list(inputs.keys())
-    input_df = pd.DataFrame([[inputs.get(f, None) for f in feature_order]], columns=feature_order)
-    for col in input_df.select_dtypes(include=['object']).columns:
-        input_df[col] = input_df[col].astype('category')
-    prediction = model.predict(input_df)[0]
-    results.append({"Parkplatz": model_name_value, "Vorhersage %": round(prediction, 2)})
+times = time_features(prediction_time)
+
+# --- Vorhersagen berechnen ---
+# Eine Eingabetabelle (NumPy-Spalten) für alle Parkplätze; pro Parkplatz wird nur eine Zeile daraus
+# als float32-Matrix an den Booster gegeben, ohne pandas
+lot_table = lot_feature_table(tuple(parking_names))
+# Wetter pro Parkplatz (ein Wert je Zeile der Eingabetabelle)
+lot_weather = {name: values[:, 0]
+               for name, values in weather_client.lookup(lot_table.keys, [prediction_time], weather_snapshot).items()}
+features = lot_table.columns(lot_weather, times, selected_parking, in_event_window, event_size)
+
+def memo_key(key):
+    # Event-Angaben gelten nur für den gewählten Parkplatz, wie in der Eingabetabelle
+    i = lot_table.positions[key]
+    weather_of_lot = {name: values[i] for name, values in lot_weather.items()}
     if key == selected_parking:
-        selected_prediction = round(prediction, 2)
+        return prediction_key(key, prediction_time, weather_of_lot, in_event_window, event_size, model_fingerprints[key])
+    return prediction_key(key, prediction_time, weather_of_lot, 0, None, model_fingerprints[key])
+
+def predict_lots(lots):
+    # lots: Parkplatz-Key -> Modell. Cache-Treffer direkt, der Rest gemeinsam über den Dispatcher (falls aktiv)
+    # Läuft dieselbe Vorhersage (Parkplatz, Slot, Wetter, Event, Modellstand) schon in einer anderen Session,
+    # wird auf deren Ergebnis gewartet statt neu gerechnet
+    predictions = {key: prediction_cache.get(memo_key(key)) for key in lots}
+    flights = {("prediction",) + memo_key(key): key for key, prediction in predictions.items() if prediction is None}
+
+    def compute(flight_keys):
+        missing = [flights[flight_key] for flight_key in flight_keys]
+        if dispatcher is not None:
+            futures = {key: dispatcher.submit(lots[key], features, lot_table.positions[key]) for key in missing}
+            computed = {key: future.result() for key, future in futures.items()}
+        else:
+            computed = {}
+            for key in missing:
+                i = lot_table.positions[key]
+                computed[key] = predict_columns(lots[key], features, slice(i, i + 1), PREDICT_ENGINE)[0]
+        computed = {key: clip_prediction(p) for key, p in computed.items()}
+        prediction_cache.put_many({memo_key(key): p for key, p in computed.items()})
+        return {flight_key: computed[flights[flight_key]] for flight_key in flight_keys}
+
+    predictions.update((flights[flight_key], p) for flight_key, p in single_flight.do_many(list(flights), compute).items())
+    return predictions
+
+def predict_all(model):
+    # Globales Modell: ein predict-Aufruf für alle Parkplätze, außer alle Werte liegen schon im Cache
+    cached = {key: prediction_cache.get(memo_key(key)) for key in lot_table.keys}
+    if all(p is not None for p in cached.values()):
+        return cached
+    flights = {("prediction",) + memo_key(key): key for key in lot_table.keys}
+
+    def compute(flight_keys):
+        predictions = predict_columns(model, features, slice(None), PREDICT_ENGINE)
+        predictions = {key: clip_prediction(p) for key, p in zip(lot_table.keys, predictions)}
+        prediction_cache.put_many({memo_key(key): p for key, p in predictions.items()})
+        return {flight_key: predictions[flights[flight_key]] for flight_key in flight_keys}
 
-for res in results:
-    res["Vorhersage %"] = min(res["Vorhersage %"], 1.00)
-if selected_prediction is not None:
-    selected_prediction = min(selected_prediction, 1.00)
+    return {flights[flight_key]: p for flight_key, p in single_flight.do_many(list(flights), compute).items()}
 
-# --- KPIs ---
+def render_kpi(placeholder, caption, label, value):
+    with placeholder.container():
+        st.markdown(caption)
+        st.metric(label=f"{label}", value=f"{int(value*100)}%")
+
+def build_deck(results, unavailable_lots):
+    vorhersagen = [res.get("Vorhersage %", 0) for res in results]
+    min_val, max_val = min(vorhersagen), max(vorhersagen)
+    range_val = max_val - min_val if max_val != min_val else 1
+    map_data = []
+    for res in results:
+        parkplatz = res.get("Parkplatz", "Unbekannt")
+        vorhersage = res.get("Vorhersage %", 0)
+        coords = coordinates_mapping.get(parkplatz)
+        if coords:
+            norm_value = (vorhersage - min_val) / range_val
+            r = int(norm_value * 255)
+            g = int((1 - norm_value) * 255)
+            map_data.append({
+                "lat": coords[1],
+                "lon": coords[0],
+                "Parkplatz": parkplatz,
+                "TooltipText": f"Prediction for {prediction_time.strftime('%H:%M')}: {int(vorhersage*100)}%",
+                "color": [r, g, 0]
+            })
+    for key in unavailable_lots:
+        parkplatz = name_mapping.get(key, key)
+        coords = coordinates_mapping.get(parkplatz)
+        if coords:
+            map_data.append({
+                "lat": coords[1],
+                "lon": coords[0],
+                "Parkplatz": parkplatz,
+                "TooltipText": "Prediction unavailable",
+                "color": [128, 128, 128]
+            })
+
+    map_df = pd.DataFrame(map_data)
+    scatter_layer = pdk.Layer(
+        "ScatterplotLayer",
+        data=map_df,
+        get_position="[lon, lat]",
+        get_fill_color="color",
+        get_radius=50,
+        pickable=True
+    )
+    tooltip = {"html": "<b>{Parkplatz}</b><br/>{TooltipText}",
+               "style": {"backgroundColor": "steelblue", "color": "white"}}
+    view_state = pdk.ViewState(latitude=51.0504, longitude=13.7373, zoom=13)
+    return pdk.Deck(layers=[scatter_layer], initial_view_state=view_state, tooltip=tooltip)
+
+# --- KPIs und Karte als Platzhalter, die während der Berechnung aktualisiert werden ---
 st.markdown("---")
 col_selected, col_min, col_max = st.columns([1, 1, 1], border=True)
+selected_placeholder = col_selected.empty()
+min_placeholder = col_min.empty()
+max_placeholder = col_max.empty()
 
-with col_selected:
-    if selected_prediction is not None:
-        st.markdown("Predicted occupation for selection")
-        st.metric(label=f"{selected_parking_display}", value=f"{int(selected_prediction*100)}%")
+st.markdown("---")
+st.subheader("🗺️ Map for Dresden parking prediction")
+map_placeholder = st.empty()
 
-if results:
+def update_overview(results):
     min_result = min(results, key=lambda x: x["Vorhersage %"])
     max_result = max(results, key=lambda x: x["Vorhersage %"])
-    with col_min:
-        st.markdown("Lowest predicted occupation")
-        st.metric(label=f"{min_result['Parkplatz']}", value=f"{int(min_result['Vorhersage %']*100)}%")
-    with col_max:
-        st.markdown("Highest predicted occupation")
-        st.metric(label=f"{max_result['Parkplatz']}", value=f"{int(max_result['Vorhersage %']*100)}%")
-
-# --- Karte ---
-st.markdown("---")
-st.subheader("🗺️ Map for Dresden parking prediction")
-vorhersagen = [res.get("Vorhersage %", 0) for res in results]
-min_val, max_val = min(vorhersagen), max(vorhersagen)
-range_val = max_val - min_val if max_val != min_val else 1
-map_data = []
-for res in results:
-    parkplatz = res.get("Parkplatz", "Unbekannt")
-    vorhersage = res.get("Vorhersage %", 0)
-    coords = coordinates_mapping.get(parkplatz)
-    if coords:
-        norm_value = (vorhersage - min_val) / range_val
-        r = int(norm_value * 255)
-        g = int((1 - norm_value) * 255)
-        map_data.append({
-            "lat": coords[1],
-            "lon": coords[0],
-            "Parkplatz": parkplatz,
-            "TooltipText": f"Prediction for {prediction_time.strftime('%H:%M')}: {int(vorhersage*100)}%",
-            "color": [r, g, 0]
-        })
+    render_kpi(min_placeholder, "Lowest predicted occupation", min_result["Parkplatz"], min_result["Vorhersage %"])
+    render_kpi(max_placeholder, "Highest predicted occupation", max_result["Parkplatz"], max_result["Vorhersage %"])
+    map_placeholder.pydeck_chart(build_deck(results, unavailable_lots))
+
+# Gewählter Parkplatz zuerst und sofort anzeigen, die übrigen in Blöcken nachladen
+results = []
+selected_prediction = None
+inputs = None
+remaining_keys = [k for k in models if k != selected_parking]
+selected_model = models[selected_parking] if selected_parking in models else None
+# Ohne Event stehen alle Werte im vorberechneten Raster, sofern es zum aktuellen Modellstand gehört
+grid = forecaster.grid if forecaster is not None else None
+if grid is None or in_event_window or grid.model_version != model_version:
+    grid = None
+grid_slot = grid.slot_index(prediction_time) if grid is not None else None
+if grid_slot is not None:
+    column = grid.column(grid_slot)
+    inputs = lot_table.row(features, selected_parking)
+    results = [{"Parkplatz": name_mapping.get(key, key), "Vorhersage %": clip_prediction(column[key])}
+               for key in [selected_parking] + remaining_keys if not np.isnan(column.get(key, np.nan))]
+    if not np.isnan(column.get(selected_parking, np.nan)):
+        selected_prediction = clip_prediction(column[selected_parking])
+        render_kpi(selected_placeholder, "Predicted occupation for selection", selected_parking_display, selected_prediction)
+    if results:
+        update_overview(results)
+    remaining_keys = []
+elif global_model is not None:
+    predictions = predict_all(global_model)
+    inputs = lot_table.row(features, remaining_keys[-1] if remaining_keys else selected_parking)
+    selected_prediction = predictions[selected_parking]
+    results = [{"Parkplatz": name_mapping.get(key, key), "Vorhersage %": predictions[key]}
+               for key in [selected_parking] + remaining_keys]
+    render_kpi(selected_placeholder, "Predicted occupation for selection", selected_parking_display, selected_prediction)
+    update_overview(results)
+    remaining_keys = []
+elif selected_model is not None:
+    inputs = lot_table.row(features, selected_parking)
+    selected_prediction = predict_lots({selected_parking: selected_model})[selected_parking]
+    results.append({"Parkplatz": name_mapping.get(selected_parking, selected_parking), "Vorhersage %": selected_prediction})
+    render_kpi(selected_placeholder, "Predicted occupation for selection", selected_parking_display, selected_prediction)
+    update_overview(results)
 
-map_df = pd.DataFrame(map_data)
-scatter_layer = pdk.Layer(
-    "ScatterplotLayer",
-    data=map_df,
-    get_position="[lon, lat]",
-    get_fill_color="color",
-    get_radius=50,
-    pickable=True
-)
-tooltip = {"html": "<b>{Parkplatz}</b><br/>{TooltipText}",
-           "style": {"backgroundColor": "steelblue", "color": "white"}}
-view_state = pdk.ViewState(latitude=51.0504, longitude=13.7373, zoom=13)
-st.pydeck_chart(pdk.Deck(layers=[scatter_layer], initial_view_state=view_state, tooltip=tooltip))
+for start in range(0, len(remaining_keys), RENDER_CHUNK_SIZE):
+    # Vom LRU verdrängte Modelle werden hier nachgeladen; scheitert das, fehlt der Parkplatz nur in diesem Rerun
+    chunk = {key: models[key] for key in remaining_keys[start:start + RENDER_CHUNK_SIZE]}
+    chunk = {key: model for key, model in chunk.items() if model is not None}
+    for key, prediction in predict_lots(chunk).items():
+        inputs = lot_table.row(features, key)
+        results.append({"Parkplatz": name_mapping.get(key, key), "Vorhersage %": prediction})
+    if results:
+        update_overview(results)
 
 # Legende
 st.markdown("<div style='display:flex;align-items:center;'><div style='width:20px;height:20px;background-color:rgb(0,255,0);margin-right:5px'></div><span style='margin-right:20px'>Low predicted occupation</span><div style='width:20px;height:20px;background-color:rgb(255,255,0);margin-right:5px'></div><span style='margin-right:20px'>Medium predicted occupation</span><div style='width:20px;height:20px;background-color:rgb(255,0,0);margin-right:5px'></div><span>High predicted occupation</span></div>", unsafe_allow_html=True)
 
 st.markdown("---")
 
+# --- Verlauf der nächsten 48 Stunden für den gewählten Parkplatz (ein predict-Aufruf für alle Slots) ---
+if selected_model is not None:
+    st.subheader(f"📈 Predicted occupation for {selected_parking_display} over the next 48 hours")
+    slots = horizon_slots(slot_start(datetime.now(timezone.utc).astimezone(local_tz)))
+    grid_start = grid.slot_index(slots[0]) if grid is not None else None
+    grid_curve = grid.curve(selected_parking, grid_start) if grid_start is not None else None
+    if grid_curve is not None and not np.isnan(grid_curve[1]).any():
+        curve = pd.DataFrame({"Time": grid_curve[0], "Vorhersage %": [clip_prediction(p) for p in grid_curve[1]]})
+    else:
+        curve = sweep(selected_model, lot_table, selected_parking, slots, weather_series,
+                      in_event_window, event_size, PREDICT_ENGINE)
+    st.line_chart(pd.DataFrame({"Predicted occupation (%)": curve["Vorhersage %"].to_numpy() * 100},
+                               index=[t.replace(tzinfo=None) for t in curve["Time"]]))
+    st.markdown("---")
+
+# --- Was-wäre-wenn: Event-Größen × Wetter-Varianten für den gewählten Parkplatz (ein predict-Aufruf) ---
+if selected_model is not None:
+    with st.expander(f"🔀 What-if scenarios for {selected_parking_display}"):
+        weather_variants = st.multiselect(
+            "Weather variants",
+            options=[name for name in WEATHER_SCENARIOS if name != BASELINE[0]],
+        )
+        scenarios = scenario_table(selected_model, lot_table, selected_parking, weather, times,
+                                   weather_variants, PREDICT_ENGINE)
+        st.dataframe(scenario_labels(scenarios))
+        st.caption("Predicted occupation at the selected time; in brackets the difference in percentage points "
+                   "to the forecast weather without event.")
+        if not distinguishes_event_size(selected_model):
+            st.caption("This model has no stored event-size categories, so small, medium and large events "
+                       "give the same prediction and are shown as one column.")
+    st.markdown("---")
+
 # Debugging
 show_debug = st.toggle("Debugging Mode")
 if show_debug:
@@ -210,3 +396,30 @@ if show_debug:
     st.json(inputs)
     st.subheader("All prediction results")
     st.dataframe(pd.DataFrame(results))
+    if unavailable_lots:
+        st.subheader("Unavailable models")
+        st.json(unavailable_lots)
+    st.subheader("Model cache")
+    st.json(warmup.registry.cache_stats())
+    st.subheader("Prediction cache")
+    st.json(prediction_cache.stats())
+    st.subheader("Weather")
+    st.json(weather_client.stats())
+    st.subheader("Inference policy")
+    st.json({"nthread": inference_policy.nthread, "max_concurrent": inference_policy.max_concurrent})
+    st.subheader("Coalesced requests")
+    st.json(single_flight.stats())
+    if dispatcher is not None:
+        st.subheader("Inference dispatcher")
+        st.json(dispatcher.stats())
+    if forecaster is not None and forecaster.grid is not None:
+        st.subheader("Forecast grid")
+        st.json({
+            "used_for_this_page": grid_slot is not None,
+            "computed_at": datetime.fromtimestamp(forecaster.grid.computed_at, local_tz).strftime("%d.%m.%Y, %H:%M:%S"),
+            "compute_seconds": round(forecaster.duration, 2),
+            "lots": len(forecaster.grid.keys),
+            "slots": len(forecaster.grid.slots),
+            "model_version": forecaster.grid.model_version,
+            "weather_version": forecaster.grid.weather_version,
+        })
@@ -0,0 +1,166 @@
+import functools
+from datetime import date
+
+import holidays
+import numpy as np
+import pandas as pd
+
+from mappings import capacity_mapping, distance_mapping, district_mapping, name_mapping, occupancy_mapping, type_mapping
+
+sachsen_holidays = holidays.Germany(prov='SN')
+
+# Wetterwerte, wenn open-meteo für den Zeitpunkt nichts liefert (siehe weather.WeatherSeries)
+DEFAULT_WEATHER = {"temperature": 10.0, "description": "Clear", "humidity": 50.0, "rain": 0.0}
+
+
+def get_occupancy_value(parking_key, minute_of_day):
+    mapped_name = name_mapping.get(parking_key, parking_key)
+    if mapped_name not in occupancy_mapping:
+        return 50.0
+    rounded_minute = str(5 * round(minute_of_day / 5))
+    return occupancy_mapping[mapped_name].get(rounded_minute, 50.0)
+
+
+def time_features(prediction_time):
+    weekday = prediction_time.weekday()
+    return {
+        "hour": prediction_time.hour,
+        "minute_of_day": prediction_time.hour * 60 + prediction_time.minute,
+        "weekday": weekday,
+        "is_weekend": 1 if weekday >= 5 else 0,
+        "is_holiday": 1 if date(prediction_time.year, prediction_time.month, prediction_time.day) in sachsen_holidays else 0,
+    }
+
+
+class LotFeatureTable:
+    # Eingaben für alle Parkplätze als eine Tabelle (eine Zeile pro Parkplatz, Spalten = Modell-Features).
+    # Statische Attribute und die typische Auslastung je 5-Minuten-Slot werden einmal vorberechnet,
+    # Zeit, Wetter und Event pro Rerun per Broadcasting eingetragen.
+
+    def __init__(self, keys):
+        self.keys = list(keys)
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        names = [name_mapping.get(key, key) for key in self.keys]
+        self.name = np.array(names, dtype=object)
+        self.capacity = np.array([float(capacity_mapping.get(key, 0)) for key in self.keys])
+        self.district = np.array([district_mapping.get(key, "Unbekannt") for key in self.keys], dtype=object)
+        self.type = np.array([type_mapping.get(name, "Unbekannt") for name in names], dtype=object)
+        self.distance = np.array([float(distance_mapping.get(name, 0.0)) for name in names])
+        # Zeile = Parkplatz, Spalte = Minute des Tages / 5 (0 bis 1440)
+        slots = range(0, 24 * 60 + 5, 5)
+        self.occupancy = np.array([[float(get_occupancy_value(key, m)) for m in slots]
+                                   for key in self.keys]).reshape(len(self.keys), len(slots))
+
+    def _columns(self, positions, weather, times, in_event, event_sizes):
+        # positions: Parkplatz-Index pro Zeile; Wetter- und Zeitwerte als Skalar oder ein Wert pro Zeile
+        n = len(positions)
+
+        def column(value, dtype=np.float64):
+            return np.broadcast_to(np.asarray(value, dtype=dtype), (n,))
+
+        minute_of_day = column(times["minute_of_day"])
+        return {
+            "Name": self.name[positions],
+            "Capacity": self.capacity[positions],
+            "Temperature": column(weather["temperature"]),
+            "Description": column(weather["description"], object),
+            "Humidity": column(weather["humidity"]),
+            "Rain": column(weather["rain"]),
+            "District": self.district[positions],
+            "Type": self.type[positions],
+            "final_avg_occ": self.occupancy[positions, np.rint(minute_of_day / 5).astype(np.int64)],
+            "in_event_window": column(in_event, np.int64),
+            "event_size": column(event_sizes, object),
+            "distance_to_nearest_parking": self.distance[positions],
+            "hour": column(times["hour"]),
+            "minute_of_day": minute_of_day,
+            "weekday": column(times["weekday"]),
+            "is_weekend": column(times["is_weekend"]),
+            "is_holiday": column(times["is_holiday"]),
+        }
+
+    def _frame(self, positions, weather, times, in_event, event_sizes, index):
+        return pd.DataFrame(self._columns(positions, weather, times, in_event, event_sizes), index=index)
+
+    def build(self, weather, times, event_key=None, in_event_window=0, event_size=None):
+        # Alle Parkplätze zu einem Zeitpunkt
+        return pd.DataFrame(self.columns(weather, times, event_key, in_event_window, event_size), index=self.keys)
+
+    def columns(self, weather, times, event_key=None, in_event_window=0, event_size=None):
+        # Wie build, aber als dict von NumPy-Arrays (Zeile i = self.keys[i]) für den Pfad ohne pandas
+        n = len(self.keys)
+        in_event = np.zeros(n, dtype=np.int64)
+        event_sizes = np.full(n, None, dtype=object)
+        if event_key in self.positions:
+            # Event-Angaben gelten nur für den gewählten Parkplatz
+            in_event[self.positions[event_key]] = int(in_event_window)
+            event_sizes[self.positions[event_key]] = event_size
+        return self._columns(np.arange(n), weather, times, in_event, event_sizes)
+
+    def build_slots(self, key, weather, times, in_event_window=0, event_size=None):
+        # Ein Parkplatz zu vielen Zeitpunkten; weather/times als dict von Listen (ein Wert pro Slot)
+        n = len(times["minute_of_day"])
+        positions = np.full(n, self.positions[key])
+        return self._frame(positions, weather, times, int(in_event_window), event_size, pd.RangeIndex(n))
+
+    def lot_columns(self, key, n, weather, times, in_event_window=0, event_size=None):
+        # Ein Parkplatz, n Zeilen (z. B. Szenarien); jeder Wert als Skalar oder ein Wert pro Zeile
+        return self._columns(np.full(n, self.positions[key]), weather, times, in_event_window, event_size)
+
+    def build_grid(self, weather, times):
+        # Alle Parkplätze × alle Slots ohne Event; die Zeilen eines Parkplatzes liegen zusammenhängend.
+        # Wetter pro Slot (für alle Parkplätze gleich) oder pro Parkplatz × Slot
+        n_slots = len(times["minute_of_day"])
+        positions = np.repeat(np.arange(len(self.keys)), n_slots)
+        weather = {name: np.broadcast_to(np.asarray(values), (len(self.keys), n_slots)).reshape(-1)
+                   for name, values in weather.items()}
+        times = {name: np.tile(values, len(self.keys)) for name, values in times.items()}
+        return self._frame(positions, weather, times, 0, None, pd.RangeIndex(len(positions)))
+
+    def grid_lot(self, frame, key, n_slots):
+        # Zeilen eines Parkplatzes aus build_grid (Slice, keine Kopie)
+        i = self.positions[key]
+        return frame.iloc[i * n_slots:(i + 1) * n_slots]
+
+    def lot(self, frame, key):
+        # Einzeiliger Ausschnitt für einen Parkplatz (Slice, keine Kopie)
+        i = self.positions[key]
+        return frame.iloc[i:i + 1]
+
+    def row(self, columns, key):
+        # Eingaben eines Parkplatzes aus columns() als dict mit Python-Typen (für die Debug-Anzeige)
+        i = self.positions[key]
+        return {col: values[i].item() if isinstance(values[i], np.generic) else values[i]
+                for col, values in columns.items()}
+
+
+@functools.lru_cache(maxsize=8)
+def lot_feature_table(keys):
+    # Pro Prozess und Parkplatz-Menge nur einmal aufbauen; keys als Tupel
+    return LotFeatureTable(keys)
+
+
+def model_frame(model, frame):
+    # Spalten in Trainingsreihenfolge (nur falls abweichend). Kategoriale Spalten bekommen die beim
+    # Training festgehaltenen Dtypes des Modells; nur Modelle ohne Schema (alte Pickles) fallen auf
+    # astype("category") mit aus den Eingaben abgeleiteten Levels zurück.
+    if hasattr(model, "feature_names_in_") and list(frame.columns) != list(model.feature_names_in_):
+        frame = frame[list(model.feature_names_in_)]
+    schema = getattr(model, "category_dtypes", None) or {}
+    dtypes = {}
+    for col, dtype in frame.dtypes.items():
+        if col in schema:
+            if dtype != schema[col]:
+                dtypes[col] = schema[col]
+        elif dtype == object:
+            dtypes[col] = "category"
+    return frame.astype(dtypes) if dtypes else frame
+
+
+def inferred_category_columns(model, frame):
+    # object-Spalten, deren Levels erst aus den Eingaben abgeleitet würden (Modell ohne Schema) und die im
+    # Batch mehr als einen Wert haben -> die Codes hingen sonst davon ab, welche Zeilen gemeinsam vorhergesagt werden
+    schema = getattr(model, "category_dtypes", None) or {}
+    features = set(model.feature_names_in_) if hasattr(model, "feature_names_in_") else set(frame.columns)
+    return [col for col, dtype in frame.dtypes.items()
+            if dtype == object and col in features and col not in schema and frame[col].nunique() > 1]
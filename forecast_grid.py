@@ -0,0 +1,116 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pytz
+
+from features import lot_feature_table
+from horizon import HORIZON_SLOTS, SLOT_MINUTES, horizon_slots, slot_start, slot_times
+from inference import predict_frame
+from weather import WeatherClient
+
+logger = logging.getLogger(__name__)
+
+
+class ForecastGrid:
+    # Vorhersagen ohne Event für alle Parkplätze × 5-Minuten-Slots (float32, NaN = keine Vorhersage).
+    # Wird nach dem Aufbau nicht mehr verändert, sondern vom Scheduler als Ganzes ersetzt.
+
+    def __init__(self, keys, slots, values, model_version, computed_at, weather_version=None):
+        self.keys = tuple(keys)
+        self.positions = {key: i for i, key in enumerate(self.keys)}
+        self.slots = slots
+        self.values = values
+        self.values.flags.writeable = False
+        self.model_version = model_version
+        self.weather_version = weather_version
+        self.computed_at = computed_at
+
+    def slot_index(self, prediction_time):
+        if not self.slots:
+            return None
+        i = round((prediction_time - self.slots[0]).total_seconds() / (SLOT_MINUTES * 60))
+        return i if 0 <= i < len(self.slots) and self.slots[i] == prediction_time else None
+
+    def column(self, i):
+        # Parkplatz-Key -> Vorhersage für Slot i
+        return dict(zip(self.keys, self.values[:, i]))
+
+    def curve(self, key, start, n=HORIZON_SLOTS):
+        # n Slots ab start für einen Parkplatz, None falls das Raster das nicht abdeckt
+        if key not in self.positions or start + n > len(self.slots):
+            return None
+        return self.slots[start:start + n], self.values[self.positions[key], start:start + n]
+
+
+class ForecastScheduler:
+    # Berechnet das Raster alle interval Sekunden im Hintergrund neu und sofort, wenn die Registry einen neuen
+    # Modellstand oder der Wetter-Client einen neuen Wetterstand veröffentlicht. Seiten lesen nur self.grid –
+    # eine Zuweisung, also immer ein vollständiges Raster.
+
+    def __init__(self, registry, lot_models, interval, engine="xgboost", tz="Europe/Berlin", poll=10.0,
+                 weather=None):
+        self.registry = registry
+        self.lot_models = lot_models   # Snapshot-Modelle -> Parkplatz-Key -> Modell
+        self.weather = weather or WeatherClient()
+        self.interval = interval
+        self.engine = engine
+        self.tz = pytz.timezone(tz)
+        self.poll = poll
+        # Etwas über 48 Stunden hinaus, damit das Raster bis zur nächsten Berechnung den ganzen Slider abdeckt
+        self.n_slots = HORIZON_SLOTS + math.ceil(interval / (SLOT_MINUTES * 60))
+        self.grid = None
+        self.duration = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="forecast-grid", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        last_run, last_version = None, None
+        while True:
+            weather = self.weather.snapshot
+            version = (self.registry.version, weather.version if weather is not None else None)
+            if last_run is None or time.monotonic() - last_run >= self.interval or version != last_version:
+                last_run, last_version = time.monotonic(), version
+                try:
+                    self.grid = self.compute(version[0])
+                    # Beim Start holt compute das erste Wetter selbst -> dessen Stand gilt als berechnet
+                    last_version = (version[0], self.grid.weather_version)
+                except Exception:
+                    logger.exception("Forecast grid update failed")
+            if self._stop.wait(self.poll):
+                return
+
+    def compute(self, model_version):
+        start = time.perf_counter()
+        models = self.lot_models(self.registry.snapshot()[0])
+        table = lot_feature_table(tuple(models))
+        slots = horizon_slots(slot_start(datetime.now(timezone.utc).astimezone(self.tz)), self.n_slots)
+        # Beim allerersten Mal wartet current() auf den Abruf; danach immer der zuletzt veröffentlichte Wetterstand
+        snapshot = self.weather.current()
+        weather = self.weather.lookup(table.keys, slots, snapshot)   # pro Parkplatz × Slot
+        weather_version = snapshot.version if snapshot is not None else None
+        times = slot_times(slots)
+        frame = table.build_grid(weather, times)
+        values = np.full((len(table.keys), len(slots)), np.nan, dtype=np.float32)
+        shared = next(iter(models.values()), None)
+        if shared is not None and all(model is shared for model in models.values()):
+            # Globales Modell: ein predict-Aufruf für das ganze Raster
+            values[:] = predict_frame(shared, frame, self.engine).reshape(values.shape)
+        else:
+            for i, (key, model) in enumerate(models.items()):
+                if model is not None:
+                    values[i] = predict_frame(model, table.grid_lot(frame, key, len(slots)), self.engine)
+        self.duration = time.perf_counter() - start
+        logger.info("Forecast grid for %d lots × %d slots computed in %.1fs", len(table.keys), len(slots), self.duration)
+        return ForecastGrid(table.keys, slots, values, model_version, time.time(), weather_version)
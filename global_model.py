@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import pytz
+import xgboost as xgb
+
+from features import DEFAULT_WEATHER, lot_feature_table, time_features
+from inference import predict_columns
+from mappings import name_mapping
+from model_files import GLOBAL_MODEL_PREFIX, NATIVE_EXT
+from model_registry import ModelRegistry
+from native_models import SIDECAR_VERSION, apply_categories, sidecar_path
+
+# Globales Modell: ein Booster für alle Parkplätze einer Stadt statt eines Modells pro Parkplatz.
+# Name, District, Type und Capacity sind bereits Features, der Parkplatz steckt also in den Eingaben.
+DEFAULT_CITY = "dresden"
+FEATURES = [
+    "Name", "Capacity", "Temperature", "Description", "Humidity", "Rain", "District", "Type",
+    "final_avg_occ", "in_event_window", "event_size", "distance_to_nearest_parking",
+    "hour", "minute_of_day", "weekday", "is_weekend", "is_holiday",
+]
+CATEGORICAL_FEATURES = ["Name", "Description", "District", "Type", "event_size"]
+
+
+def global_model_path(model_dir, city=DEFAULT_CITY):
+    return os.path.join(model_dir, GLOBAL_MODEL_PREFIX + city + NATIVE_EXT)
+
+
+def category_levels(frame):
+    return {c: sorted(str(v) for v in frame[c].dropna().unique()) for c in CATEGORICAL_FEATURES if c in frame}
+
+
+def train_global_model(train, target, categories, **params):
+    X = apply_categories(train[FEATURES], categories)
+    model = xgb.XGBRegressor(enable_categorical=True, tree_method="hist",
+                             **{"n_estimators": 400, "max_depth": 8, "learning_rate": 0.1, **params})
+    model.fit(X, train[target])
+    return model
+
+
+def save_global_model(model, categories, path):
+    booster = model.get_booster()
+    booster.save_model(path)
+    sidecar = {
+        "format_version": SIDECAR_VERSION,
+        "xgboost_version": xgb.__version__,
+        "feature_names": FEATURES,
+        "feature_types": list(booster.feature_types),
+        "categories": categories,
+        "best_iteration": None,
+    }
+    with open(sidecar_path(path), "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False, indent=2)
+
+
+def train_per_lot_baselines(train, target, categories, **params):
+    # Pro Parkplatz ein Modell auf demselben Trainings-Split wie das globale Modell. Die ausgelieferten
+    # xgb_model_*.pkl kennen die gesamte Historie, ihr Fehler auf den Testzeilen wäre nicht held-out.
+    return {name: train_global_model(rows, target, categories, **params) for name, rows in train.groupby("Name")}
+
+
+def compare(global_model, per_lot_models, train, test, target, categories, repeats=50):
+    # Fehler: globales Modell gegen per-Lot-Baselines aus train_per_lot_baselines (beide ohne Testzeilen).
+    # Latenz: ausgelieferte per-Lot-Modelle, so wie die App sie aufruft (predict_columns auf LotFeatureTable).
+    lot_keys = {v: k for k, v in name_mapping.items()}
+    test = test[test["Name"].map(lambda n: lot_keys.get(n, n) in per_lot_models) & test["Name"].isin(train["Name"])]
+
+    global_pred = global_model.predict(test[FEATURES])
+    baselines = train_per_lot_baselines(train[train["Name"].isin(test["Name"])], target, categories)
+    per_lot_pred = pd.Series(np.nan, index=test.index)
+    for name, rows in test.groupby("Name"):
+        per_lot_pred.loc[rows.index] = baselines[name].predict(apply_categories(rows[FEATURES], categories))
+
+    def metrics(pred):
+        err = np.asarray(pred) - test[target].to_numpy()
+        return {"MAE": float(np.mean(np.abs(err))), "RMSE": float(np.sqrt(np.mean(err ** 2)))}
+
+    # Latenz für eine App-Anfrage: eine Zeile pro Parkplatz, dieselben Eingabespalten wie auf der Seite
+    table = lot_feature_table(tuple(sorted({lot_keys.get(name, name) for name in test["Name"]})))
+    columns = table.columns(DEFAULT_WEATHER, time_features(datetime.now(timezone.utc).astimezone(pytz.timezone("Europe/Berlin"))))
+    per_lot_rows = [(per_lot_models[key], slice(i, i + 1)) for i, key in enumerate(table.keys)]
+
+    def timed(fn):
+        fn()
+        samples = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            samples.append(time.perf_counter() - start)
+        return float(np.median(samples)) * 1000
+
+    per_lot_ms = timed(lambda: [predict_columns(m, columns, rows) for m, rows in per_lot_rows])
+    global_ms = timed(lambda: predict_columns(global_model, columns, slice(None)))
+    return {
+        "rows": len(test),
+        "lots": len(per_lot_rows),
+        "per_lot": {**metrics(per_lot_pred), "latency_ms": per_lot_ms},
+        "global": {**metrics(global_pred), "latency_ms": global_ms},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the global multi-lot model and compare it with the per-lot models")
+    parser.add_argument("training_data", help="CSV with one row per lot and timestamp, model features plus target")
+    parser.add_argument("--target", default="occupation")
+    parser.add_argument("--time-column", default=None, help="split held-out data by time instead of randomly")
+    parser.add_argument("--test-size", type=float, default=0.2)
+    parser.add_argument("--model-dir", default=".")
+    parser.add_argument("--city", default=DEFAULT_CITY)
+    args = parser.parse_args()
+
+    data = pd.read_csv(args.training_data).dropna(subset=[args.target])
+    if args.time_column:
+        data = data.sort_values(args.time_column)
+        split = int(len(data) * (1 - args.test_size))
+        train, test = data.iloc[:split], data.iloc[split:]
+    else:
+        test = data.sample(frac=args.test_size, random_state=42)
+        train = data.drop(test.index)
+
+    categories = category_levels(data)
+    model = train_global_model(train, args.target, categories)
+    path = global_model_path(args.model_dir, args.city)
+    save_global_model(model, categories, path)
+    print(f"Saved {path}")
+
+    global_model = ModelRegistry(args.model_dir, model_format="native", prefix=GLOBAL_MODEL_PREFIX).refresh().get(args.city)
+    per_lot_models = ModelRegistry(args.model_dir).refresh().all()
+    if not per_lot_models:
+        print("No per-lot models found, skipping comparison")
+        return
+    result = compare(global_model, per_lot_models, train, test, args.target, categories)
+    print(f"Held-out rows: {result['rows']}, lots: {result['lots']} "
+          "(errors: per-lot baselines retrained on the training split; latency: deployed per-lot models)")
+    print(f"{'mode':<10}{'MAE':>10}{'RMSE':>10}{'latency ms':>14}")
+    for mode in ("per_lot", "global"):
+        r = result[mode]
+        print(f"{mode:<10}{r['MAE']:>10.4f}{r['RMSE']:>10.4f}{r['latency_ms']:>14.2f}")
+    print(f"Speed-up: {result['per_lot']['latency_ms'] / result['global']['latency_ms']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
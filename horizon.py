@@ -0,0 +1,40 @@
+from datetime import timedelta, timezone
+
+import pandas as pd
+
+from features import time_features
+from inference import clip_prediction, predict_frame
+
+# 48 Stunden in 5-Minuten-Schritten inklusive Startzeitpunkt -> 577 Slots, wie der Slider
+SLOT_MINUTES = 5
+HORIZON_SLOTS = 48 * 60 // SLOT_MINUTES + 1
+
+
+def slot_start(now):
+    # Auf den aktuellen 5-Minuten-Slot abrunden
+    return now.replace(minute=(now.minute // SLOT_MINUTES) * SLOT_MINUTES, second=0, microsecond=0)
+
+
+def horizon_slots(start, slots=HORIZON_SLOTS):
+    # In UTC weiterzählen und zurückrechnen, damit Sommer-/Winterzeitwechsel korrekt sind
+    start_utc = start.astimezone(timezone.utc)
+    return [(start_utc + timedelta(minutes=SLOT_MINUTES * i)).astimezone(start.tzinfo) for i in range(slots)]
+
+
+def slot_times(slots):
+    # Zeitspalten (dict von Listen, ein Wert pro Slot)
+    times = [time_features(t) for t in slots]
+    return {name: [t[name] for t in times] for name in times[0]}
+
+
+def slot_inputs(slots, weather_series):
+    # Zeitspalten und Wetterspalten (dict von Arrays, auf den Slot interpoliert)
+    return slot_times(slots), weather_series.lookup(slots)
+
+
+def sweep(model, table, key, slots, weather_series, in_event_window=0, event_size=None, engine="xgboost"):
+    # Alle Slots eines Parkplatzes in einem predict-Aufruf
+    times, weather = slot_inputs(slots, weather_series)
+    frame = table.build_slots(key, weather, times, in_event_window, event_size)
+    predictions = predict_frame(model, frame, engine)
+    return pd.DataFrame({"Time": slots, "Vorhersage %": [clip_prediction(p) for p in predictions]})
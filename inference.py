@@ -0,0 +1,282 @@
+import argparse
+import contextlib
+import threading
+import time
+import weakref
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from features import inferred_category_columns, model_frame
+from tree_engine import numpy_model
+
+# Ab xgboost 3.1 merken sich Booster die Kategorien aus dem Training und codieren pandas-Eingaben selbst um;
+# rohe Codes für Modelle ohne Schema wären dann nicht mehr gleichwertig zum pandas-Pfad
+BOOSTER_RECODES_CATEGORIES = tuple(int(part) for part in xgb.__version__.split(".")[:2]) >= (3, 1)
+
+
+class InferencePolicy:
+    # Begrenzt die Last mehrerer Sessions: nthread = OpenMP-Threads pro predict-Aufruf (0 = xgboost-Standard,
+    # alle Kerne), max_concurrent = gleichzeitig laufende predict-Aufrufe im Prozess (0 = unbegrenzt).
+    # Ohne Grenzen startet jede Session einen Pool über alle Kerne und die Maschine ist überbucht.
+
+    def __init__(self, nthread=0, max_concurrent=0):
+        self.nthread = nthread
+        self.max_concurrent = max_concurrent
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+        self._prepared = weakref.WeakSet()
+        self._lock = threading.Lock()
+
+    def prepare(self, model):
+        # nthread einmal pro Modell am Booster setzen (und am sklearn-Wrapper, falls dieser eine DMatrix baut)
+        if self.nthread <= 0 or model in self._prepared:
+            return
+        with self._lock:
+            booster = _booster(model)
+            if booster is not None:
+                booster.set_param({"nthread": self.nthread})
+            if hasattr(model, "n_jobs"):
+                model.n_jobs = self.nthread
+            self._prepared.add(model)
+
+    @contextlib.contextmanager
+    def slot(self):
+        if self._slots is None:
+            yield
+            return
+        with self._slots:
+            yield
+
+
+policy = InferencePolicy()
+
+
+def configure_policy(nthread=0, max_concurrent=0):
+    # Prozessweit; einmal beim Start setzen
+    global policy
+    policy = InferencePolicy(nthread, max_concurrent)
+    return policy
+
+
+def engine_model(model, engine="xgboost"):
+    # Pro Deployment umschaltbar: xgboost selbst oder die exportierten Bäume in NumPy
+    return numpy_model(model) if engine == "numpy" else model
+
+
+def predict_frame(model, frame, engine="xgboost"):
+    # frame: Tabelle bzw. Ausschnitt aus LotFeatureTable
+    policy.prepare(model)
+    with policy.slot():
+        return _predict_frame(model, frame, engine)
+
+
+def _predict_frame(model, frame, engine):
+    model = engine_model(model, engine)
+    columns = inferred_category_columns(model, frame)
+    if not columns:
+        return model.predict(model_frame(model, frame))
+    # Modell ohne Kategorie-Schema: Zeilen mit gleichen kategorialen Werten gemeinsam vorhersagen,
+    # damit jede Zeile dieselben Codes bekommt wie bei einer Einzelvorhersage
+    predictions = np.empty(len(frame), dtype=np.float32)
+    for rows in frame.groupby(columns, dropna=False, sort=False).indices.values():
+        predictions[rows] = model.predict(model_frame(model, frame.iloc[rows]))
+    return predictions
+
+
+def _booster(model):
+    return model.get_booster() if hasattr(model, "get_booster") else getattr(model, "booster", None)
+
+
+def _iteration_range(model):
+    # Wie model.predict: bei Early Stopping nur bis zur besten Iteration
+    try:
+        best_iteration = model.best_iteration
+    except AttributeError:
+        best_iteration = None
+    return (0, best_iteration + 1) if best_iteration is not None else (0, 0)
+
+
+class DensePredictor:
+    # Vorhersage ohne pandas: Spalten aus LotFeatureTable.columns -> float32-Matrix in Feature-Reihenfolge
+    # des Modells -> Booster.inplace_predict bzw. NumPy-Bäume. Kategoriale Features gehen als Codes hinein,
+    # genau wie xgboost sie aus einer pandas-Kategorie-Spalte liest.
+
+    def __init__(self, model, engine="xgboost"):
+        booster = _booster(model)
+        self.feature_names = list(model.feature_names_in_)
+        schema = getattr(model, "category_dtypes", None) or {}
+        # Feature -> {Level: Code}; None = Modell ohne Schema, jeder vorhandene Wert hat Code 0
+        # (wie astype("category") auf einer einzelnen Zeile)
+        self.categories = {
+            name: {level: code for code, level in enumerate(schema[name].categories)} if name in schema else None
+            for name, ftype in zip(self.feature_names, booster.feature_types or []) if ftype == "c"
+        }
+        if engine == "numpy":
+            self._predict = numpy_model(model).ensemble.predict_matrix
+        else:
+            iteration_range = _iteration_range(model)
+            self._predict = lambda X: booster.inplace_predict(X, iteration_range=iteration_range)
+
+    @staticmethod
+    def supports(model, engine="xgboost"):
+        booster = _booster(model)
+        if booster is None or not hasattr(model, "feature_names_in_"):
+            return False
+        schema = getattr(model, "category_dtypes", None) or {}
+        schemaless = any(ftype == "c" and name not in schema
+                         for name, ftype in zip(model.feature_names_in_, booster.feature_types or []))
+        return not (schemaless and engine == "xgboost" and BOOSTER_RECODES_CATEGORIES)
+
+    def encode(self, columns, rows, out=None):
+        # rows: Slice oder Index-Array in die Spalten; out: optional vorab allozierter float32-Puffer
+        n = len(columns[self.feature_names[0]][rows])
+        X = out[:n] if out is not None else np.empty((n, len(self.feature_names)), dtype=np.float32)
+        for j, name in enumerate(self.feature_names):
+            values = columns[name][rows]
+            if name not in self.categories:
+                X[:, j] = values
+            elif self.categories[name] is None:
+                X[:, j] = [np.nan if v is None or v != v else 0.0 for v in values]
+            else:
+                X[:, j] = [self.categories[name].get(v, np.nan) for v in values]
+        return X
+
+    def predict(self, columns, rows, out=None):
+        return self._predict(self.encode(columns, rows, out))
+
+
+_dense = weakref.WeakKeyDictionary()
+
+
+def dense_predictor(model, engine="xgboost"):
+    # Pro Modellobjekt und Engine nur einmal aufbauen; None, wenn das Modell nur über pandas geht
+    predictors = _dense.setdefault(model, {})
+    if engine not in predictors:
+        predictors[engine] = DensePredictor(model, engine) if DensePredictor.supports(model, engine) else None
+    return predictors[engine]
+
+
+def predict_columns(model, columns, rows, engine="xgboost"):
+    # Vorhersage für Zeilen aus LotFeatureTable.columns; ohne pandas, wo das Modell es erlaubt
+    policy.prepare(model)
+    predictor = dense_predictor(model, engine)
+    with policy.slot():
+        if predictor is not None:
+            return predictor.predict(columns, rows)
+        return _predict_frame(model, pd.DataFrame({name: values[rows] for name, values in columns.items()}), engine)
+
+
+def clip_prediction(prediction):
+    return min(round(prediction, 2), 1.00)
+
+
+def benchmark(models, table, columns, engine="xgboost", repeats=50):
+    # Mittlere Zeit pro Parkplatz (ms) für den pandas-Pfad und den Pfad ohne pandas, plus abweichende Werte
+    frame = pd.DataFrame(columns, index=table.keys)
+    lots = [(key, models[key], slice(table.positions[key], table.positions[key] + 1)) for key in table.keys]
+
+    def timed(fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeats):
+            fn()
+        return (time.perf_counter() - start) / repeats / max(len(lots), 1) * 1000
+
+    pandas_ms = timed(lambda: [predict_frame(model, frame.iloc[rows], engine) for _, model, rows in lots])
+    dense_ms = timed(lambda: [predict_columns(model, columns, rows, engine) for _, model, rows in lots])
+    mismatches = [key for key, model, rows in lots
+                  if np.float32(predict_frame(model, frame.iloc[rows], engine)[0]).view(np.uint32)
+                  != np.float32(predict_columns(model, columns, rows, engine)[0]).view(np.uint32)]
+    return {"lots": len(lots), "pandas_ms": pandas_ms, "dense_ms": dense_ms, "mismatches": mismatches}
+
+
+def load_benchmark(models, table, columns, engine="xgboost", sessions=8, nthread=0, max_concurrent=0, seconds=3.0):
+    # sessions Threads sagen reihum Parkplatz für Parkplatz einzeln vorher, wie Sessions auf der Seite.
+    # Ergebnis: Durchsatz (Vorhersagen/s) und Latenz pro Aufruf inkl. Wartezeit (p50/p99 in ms).
+    global policy
+    previous = policy
+    policy = InferencePolicy(nthread, max_concurrent)
+    lots = [(models[key], slice(table.positions[key], table.positions[key] + 1)) for key in table.keys]
+    latencies = [[] for _ in range(sessions)]
+    start_barrier = threading.Barrier(sessions)
+
+    def session(i):
+        start_barrier.wait()
+        deadline = time.perf_counter() + seconds
+        j = i
+        while time.perf_counter() < deadline:
+            model, rows = lots[j % len(lots)]
+            started = time.perf_counter()
+            predict_columns(model, columns, rows, engine)
+            latencies[i].append(time.perf_counter() - started)
+            j += 1
+
+    try:
+        for model, rows in lots:
+            predict_columns(model, columns, rows, engine)
+        threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        policy = previous
+    calls = np.concatenate([np.asarray(l) for l in latencies]) * 1000
+    return {"sessions": sessions, "nthread": nthread, "max_concurrent": max_concurrent,
+            "throughput": len(calls) / elapsed, "p50_ms": float(np.percentile(calls, 50)),
+            "p99_ms": float(np.percentile(calls, 99))}
+
+
+def _int_list(value):
+    return [int(part) for part in value.split(",")]
+
+
+def main():
+    from datetime import datetime
+
+    from features import DEFAULT_WEATHER, lot_feature_table, time_features
+    from model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Benchmark the per-lot predict overhead: pandas path vs. dense path, "
+                                                 "or throughput and p99 latency under concurrent sessions")
+    parser.add_argument("--model-dir", default=".")
+    parser.add_argument("--engine", default="xgboost", choices=["xgboost", "numpy"])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--sessions", type=_int_list, default=None,
+                        help="Comma-separated session counts: run the concurrency sweep instead (e.g. 8,32)")
+    parser.add_argument("--nthread", type=_int_list, default=[0, 1, 2, 4, 8],
+                        help="nthread values for the sweep (0 = xgboost default)")
+    parser.add_argument("--max-concurrent", type=_int_list, default=[0, 1, 2, 4, 8],
+                        help="max concurrent predict calls for the sweep (0 = unbounded)")
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    models = ModelRegistry(args.model_dir).refresh().all()
+    table = lot_feature_table(tuple(models))
+    # Event beim ersten Parkplatz, damit auch event_size einen Wert hat
+    columns = table.columns(DEFAULT_WEATHER, time_features(datetime.now()), next(iter(models), None), 1, "large")
+    if args.sessions:
+        print(f"{len(models)} lots, engine {args.engine}, {args.seconds:.0f}s per setting")
+        print(f"{'sessions':>8} {'nthread':>7} {'max_conc':>8} {'pred/s':>9} {'p50 ms':>8} {'p99 ms':>8}")
+        for sessions in args.sessions:
+            for nthread in args.nthread:
+                for max_concurrent in args.max_concurrent:
+                    r = load_benchmark(models, table, columns, args.engine, sessions, nthread, max_concurrent,
+                                       args.seconds)
+                    print(f"{sessions:>8} {nthread:>7} {max_concurrent:>8} {r['throughput']:>9.0f} "
+                          f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
+        return
+    result = benchmark(models, table, columns, args.engine, args.repeats)
+    print(f"{result['lots']} lots, engine {args.engine}")
+    print(f"pandas path: {result['pandas_ms']:.3f} ms per lot")
+    print(f"dense path:  {result['dense_ms']:.3f} ms per lot ({result['pandas_ms'] / result['dense_ms']:.1f}x faster)")
+    if result["mismatches"]:
+        raise SystemExit(f"Predictions differ for: {', '.join(result['mismatches'])}")
+    print("All predictions identical")
+
+
+if __name__ == "__main__":
+    main()
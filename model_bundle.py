@@ -0,0 +1,184 @@
+import argparse
+import json
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+from datetime import datetime, timezone
+
+import pandas as pd
+import xgboost as xgb
+
+from model_files import NATIVE_EXT, PICKLE_EXT, lot_key_from_path, model_paths
+from model_manifest import ModelIntegrityError, sha256_bytes
+from native_models import booster_model_from_raw, lot_training_rows, pickle_schema, sidecar_path
+
+# Ein Bundle enthält alle Parkplatz-Modelle in einer Datei:
+#   Header (Magic, Formatversion, Manifest-Länge) | Manifest (JSON) | Booster-Blobs (UBJSON, 4 KiB-aligned)
+# Die Datei wird per mmap geöffnet, damit sich mehrere Streamlit-Prozesse auf einem Host die Seiten teilen.
+BUNDLE_MAGIC = b"DDPBNDL\0"
+BUNDLE_FORMAT = 1
+HEADER = struct.Struct("<8sIQ")
+ALIGN = 4096
+DEFAULT_BUNDLE_NAME = "models.bundle"
+
+
+def _align(n):
+    return (n + ALIGN - 1) // ALIGN * ALIGN
+
+
+def _read_model_source(path, training_data=None):
+    # .ubj + Sidecar direkt übernehmen, .pkl in den nativen Booster umwandeln
+    if path.endswith(NATIVE_EXT):
+        with open(sidecar_path(path), encoding="utf-8") as f:
+            schema = json.load(f)
+        with open(path, "rb") as f:
+            return f.read(), schema
+    with open(path, "rb") as f:
+        model = pickle.load(f)
+    booster, schema = pickle_schema(model, lot_training_rows(training_data, lot_key_from_path(path)))
+    return bytes(booster.save_raw("ubj")), schema
+
+
+def build_bundle(model_dir, out_path, version=None, training_data=None):
+    sources = {}
+    for path in model_paths(model_dir, PICKLE_EXT):
+        sources[lot_key_from_path(path)] = path
+    for path in model_paths(model_dir, NATIVE_EXT):
+        if os.path.exists(sidecar_path(path)):
+            sources[lot_key_from_path(path)] = path
+
+    blobs = []
+    lots = {}
+    for key, path in sorted(sources.items()):
+        blob, schema = _read_model_source(path, training_data)
+        blobs.append(blob)
+        lots[key] = {
+            "length": len(blob),
+            "sha256": sha256_bytes(blob),
+            "feature_names": schema["feature_names"],
+            "feature_types": schema["feature_types"],
+            "categories": schema.get("categories"),
+            "best_iteration": schema.get("best_iteration"),
+        }
+
+    manifest = {
+        "bundle_version": version or datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ"),
+        "created": datetime.now(timezone.utc).isoformat(),
+        "xgboost_version": xgb.__version__,
+        "lots": lots,
+    }
+    # Offsets hängen von der Manifest-Länge ab -> so lange neu berechnen, bis sie stabil sind
+    data_start = 0
+    while True:
+        offset = data_start
+        for key, blob in zip(sorted(lots), blobs):
+            lots[key]["offset"] = offset
+            offset = _align(offset + len(blob))
+        manifest_bytes = json.dumps(manifest, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        needed = _align(HEADER.size + len(manifest_bytes))
+        if needed == data_start:
+            break
+        data_start = needed
+
+    # In eine temporäre Datei schreiben und atomar ersetzen
+    out_dir = os.path.dirname(os.path.abspath(out_path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".bundle-", dir=out_dir)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(BUNDLE_MAGIC, BUNDLE_FORMAT, len(manifest_bytes)))
+            f.write(manifest_bytes)
+            for key, blob in zip(sorted(lots), blobs):
+                f.seek(lots[key]["offset"])
+                f.write(blob)
+            f.truncate(max(f.tell(), data_start))
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, out_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return manifest
+
+
+class ModelBundle:
+    # Read-only-Sicht auf eine Bundle-Datei; die Booster-Blobs werden direkt aus dem mmap gelesen
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, manifest_length = HEADER.unpack_from(self._mmap, 0)
+        if magic != BUNDLE_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a model bundle")
+        if fmt != BUNDLE_FORMAT:
+            self.close()
+            raise ValueError(f"Unsupported bundle format {fmt} in {path}")
+        self.manifest = json.loads(self._mmap[HEADER.size:HEADER.size + manifest_length].decode("utf-8"))
+        self.version = self.manifest["bundle_version"]
+
+    def lots(self):
+        return self.manifest["lots"]
+
+    def fingerprint(self, key):
+        # Checksumme über Blob-Checksumme und Schema (alles außer dem Offset): derselbe Booster mit neuen
+        # Kategorie-Levels gilt als neues Modell
+        entry = {name: value for name, value in self.manifest["lots"][key].items() if name != "offset"}
+        return sha256_bytes(json.dumps(entry, sort_keys=True).encode("utf-8"))
+
+    def blob(self, key, verify=True):
+        entry = self.manifest["lots"][key]
+        view = memoryview(self._mmap)[entry["offset"]:entry["offset"] + entry["length"]]
+        if verify and sha256_bytes(view) != entry["sha256"]:
+            raise ModelIntegrityError(f"Checksum mismatch for {key} in {self.path}")
+        return view
+
+    def load(self, key, verify=True):
+        return booster_model_from_raw(self.blob(key, verify), self.manifest["lots"][key])
+
+    def verify(self):
+        bad = []
+        for key in self.manifest["lots"]:
+            try:
+                self.blob(key)
+            except ModelIntegrityError:
+                bad.append(key)
+        return bad
+
+    def close(self):
+        self._mmap.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or inspect the single-file parking model bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="pack all xgb_model_* files into one bundle")
+    build.add_argument("--model-dir", default=".")
+    build.add_argument("--out", default=DEFAULT_BUNDLE_NAME)
+    build.add_argument("--version", default=None)
+    build.add_argument("--training-data", default=None,
+                       help="CSV with the training rows, records the category levels of pickled models")
+    inspect = sub.add_parser("inspect", help="print the manifest and verify all checksums")
+    inspect.add_argument("path", nargs="?", default=DEFAULT_BUNDLE_NAME)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        training_data = pd.read_csv(args.training_data) if args.training_data else None
+        manifest = build_bundle(args.model_dir, args.out, args.version, training_data)
+        print(f"{args.out}: version {manifest['bundle_version']}, {len(manifest['lots'])} lots")
+    else:
+        bundle = ModelBundle(args.path)
+        print(f"{args.path}: version {bundle.version}, {len(bundle.lots())} lots")
+        for key, entry in sorted(bundle.lots().items()):
+            print(f"  {key}: {entry['length']} bytes, sha256 {entry['sha256'][:12]}")
+        bad = bundle.verify()
+        bundle.close()
+        if bad:
+            raise SystemExit(f"Checksum mismatch: {', '.join(bad)}")
+
+
+if __name__ == "__main__":
+    main()
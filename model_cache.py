@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def model_nbytes(model):
+    # Größe eines Modells = serialisierter Booster (UBJSON). xgboost bietet keine Abfrage des
+    # Heap-Verbrauchs; die Baumknoten im Speicher liegen in derselben Größenordnung.
+    booster = model.get_booster() if hasattr(model, "get_booster") else getattr(model, "booster", None)
+    return len(booster.save_raw("ubj")) if booster is not None else 0
+
+
+class ModelCache:
+    # LRU-Cache für geladene Modelle mit Speicherbudget in Bytes (0 = unbegrenzt, Größen werden dann nicht gemessen).
+    # Gepinnte Parkplätze (z. B. die aktuelle Auswahl einer Session) werden nicht verdrängt.
+
+    def __init__(self, budget_bytes=0, sizeof=model_nbytes):
+        self.budget_bytes = budget_bytes
+        self.sizeof = sizeof
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # Signatur -> (Parkplatz-Key, Modell, Bytes)
+        self._pins = {}                 # Parkplatz-Key -> gepinnt bis (time.monotonic)
+        self._sizes = {}                # Signatur -> Bytes; einmal gemessen, auch nach Verdrängung
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.bytes_resident = 0
+
+    def get(self, signature):
+        with self._lock:
+            entry = self._entries.get(signature)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(signature)
+            self.hits += 1
+            return entry[1]
+
+    def __contains__(self, signature):
+        return signature in self._entries
+
+    def put(self, signature, key, model):
+        # Ohne Budget wird die Größe nie gebraucht -> Booster nicht serialisieren
+        size = self._sizes.get(signature)
+        if size is None:
+            size = self.sizeof(model) if self.budget_bytes else 0
+        with self._lock:
+            self._sizes[signature] = size
+            old = self._entries.pop(signature, None)
+            if old is not None:
+                self.bytes_resident -= old[2]
+            self._entries[signature] = (key, model, size)
+            self.bytes_resident += size
+            self._evict(keep=signature)
+
+    def retain(self, signatures):
+        # Alles entfernen, was nicht mehr zum aktuellen Modellstand gehört (kein Eviction-Zähler)
+        with self._lock:
+            for signature in [s for s in self._entries if s not in signatures]:
+                self.bytes_resident -= self._entries.pop(signature)[2]
+            self._sizes = {s: size for s, size in self._sizes.items() if s in signatures}
+
+    def pin(self, key, seconds):
+        with self._lock:
+            self._pins[key] = max(self._pins.get(key, 0), time.monotonic() + seconds)
+
+    def _evict(self, keep):
+        if not self.budget_bytes:
+            return
+        now = time.monotonic()
+        self._pins = {k: until for k, until in self._pins.items() if until > now}
+        for signature in list(self._entries):
+            if self.bytes_resident <= self.budget_bytes:
+                break
+            key, _, size = self._entries[signature]
+            if signature == keep or key in self._pins:
+                continue
+            del self._entries[signature]
+            self.bytes_resident -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes_resident": self.bytes_resident,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "pinned": sorted(self._pins),
+            }
@@ -0,0 +1,19 @@
+import glob
+import os
+
+# Dateinamen der Modelle: <Präfix><Parkplatz-Key><Endung>, z. B. xgb_model_Altmarkt_-_Galerie.pkl.
+# Gemeinsam für Registry, Bundle und Konvertierung (ohne deren Abhängigkeiten untereinander).
+MODEL_PREFIX = "xgb_model_"
+GLOBAL_MODEL_PREFIX = "xgb_global_"   # ein Modell für alle Parkplätze einer Stadt, Key = Stadt
+PICKLE_EXT = ".pkl"
+NATIVE_EXT = ".ubj"
+SIDECAR_EXT = ".json"
+
+
+def lot_key_from_path(path, prefix=MODEL_PREFIX):
+    # "xgb_model_Altmarkt_-_Galerie.pkl" -> "Altmarkt_-_Galerie"
+    return os.path.splitext(os.path.basename(path))[0].replace(prefix, "", 1)
+
+
+def model_paths(model_dir, ext, prefix=MODEL_PREFIX):
+    return sorted(glob.glob(os.path.join(model_dir, prefix + "*" + ext)))
@@ -0,0 +1,93 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+from model_files import GLOBAL_MODEL_PREFIX, MODEL_PREFIX, NATIVE_EXT, PICKLE_EXT, SIDECAR_EXT
+
+# Integritäts-Manifest für einzelne Modelldateien (xgb_model_* und xgb_global_*, jeweils .pkl / .ubj / .json):
+# SHA-256 je Datei, wird beim Laden geprüft. Das Bundle trägt seine Checksummen selbst im Manifest.
+MANIFEST_NAME = "models.manifest.json"
+MODEL_GLOBS = tuple(prefix + "*" + ext for prefix in (MODEL_PREFIX, GLOBAL_MODEL_PREFIX)
+                    for ext in (PICKLE_EXT, NATIVE_EXT, SIDECAR_EXT))
+
+
+class ModelIntegrityError(ValueError):
+    pass
+
+
+def sha256_bytes(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(model_dir):
+    files = {}
+    for pattern in MODEL_GLOBS:
+        for path in sorted(glob.glob(os.path.join(model_dir, pattern))):
+            files[os.path.basename(path)] = sha256_file(path)
+    return {"created": datetime.now(timezone.utc).isoformat(), "files": files}
+
+
+def write_manifest(model_dir, path=None):
+    # Atomar schreiben, damit der Watcher nie ein halbes Manifest liest
+    path = path or os.path.join(model_dir, MANIFEST_NAME)
+    manifest = build_manifest(model_dir)
+    fd, tmp_path = tempfile.mkstemp(prefix=".manifest-", dir=os.path.dirname(os.path.abspath(path)))
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, path)
+    return manifest
+
+
+def load_manifest(model_dir):
+    # Ohne Manifest-Datei wird nichts geprüft (None)
+    path = os.path.join(model_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f).get("files", {})
+
+
+def verify_bytes(name, data, manifest):
+    if manifest is None or name not in manifest:
+        return
+    actual = sha256_bytes(data)
+    if actual != manifest[name]:
+        raise ModelIntegrityError(f"SHA-256 mismatch for {name}: expected {manifest[name][:12]}, got {actual[:12]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write or check the SHA-256 manifest of the model files")
+    parser.add_argument("command", choices=["write", "check"])
+    parser.add_argument("--model-dir", default=".")
+    args = parser.parse_args()
+
+    if args.command == "write":
+        manifest = write_manifest(args.model_dir)
+        print(f"{MANIFEST_NAME}: {len(manifest['files'])} files")
+        return
+    manifest = load_manifest(args.model_dir)
+    if manifest is None:
+        raise SystemExit(f"No {MANIFEST_NAME} in {args.model_dir}")
+    bad = [name for name, expected in sorted(manifest.items())
+           if not os.path.exists(os.path.join(args.model_dir, name))
+           or sha256_file(os.path.join(args.model_dir, name)) != expected]
+    if bad:
+        raise SystemExit(f"Checksum mismatch or missing: {', '.join(bad)}")
+    print(f"{len(manifest)} files OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+import functools
+import logging
+import os
+import pickle
+import threading
+import time
+from collections.abc import Mapping
+from dataclasses import dataclass
+
+import xgboost as xgb
+
+from model_bundle import DEFAULT_BUNDLE_NAME, ModelBundle
+from model_cache import ModelCache
+from model_files import MODEL_PREFIX, NATIVE_EXT, PICKLE_EXT, lot_key_from_path, model_paths
+from model_manifest import load_manifest, verify_bytes
+from native_models import booster_model_from_raw, parse_sidecar, sidecar_path
+from singleflight import single_flight
+
+LOAD_ERRORS = (EOFError, pickle.UnpicklingError, OSError, ValueError, KeyError, xgb.core.XGBoostError)
+
+logger = logging.getLogger(__name__)
+
+
+def file_signature(path):
+    stat = os.stat(path)
+    signature = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+    if path.endswith(NATIVE_EXT):
+        # Das Sidecar gehört zum Modell: Änderungen daran lösen ebenfalls einen Reload aus
+        sidecar = os.stat(sidecar_path(path))
+        signature += (sidecar.st_mtime_ns, sidecar.st_size)
+    return signature
+
+
+class LotModels(Mapping):
+    # Parkplatz-Key -> Modell für einen Registry-Stand. Modelle werden über den LRU-Cache
+    # aufgelöst; ein verdrängtes Modell wird beim Zugriff nachgeladen (None, falls das scheitert).
+
+    def __init__(self, registry, catalog):
+        self._registry = registry
+        self._catalog = catalog   # Parkplatz-Key -> (Signatur, Loader)
+
+    def __getitem__(self, key):
+        signature, load = self._catalog[key]
+        return self._registry._resolve(key, signature, load)
+
+    def __contains__(self, key):
+        return key in self._catalog
+
+    def __iter__(self):
+        return iter(self._catalog)
+
+    def __len__(self):
+        return len(self._catalog)
+
+    def entry(self, key):
+        return self._catalog.get(key)
+
+    def signatures(self):
+        return {k: v[0] for k, v in self._catalog.items()}
+
+
+def loader_bundle(load):
+    # Bundle, aus dem ein Loader liest (None bei Einzeldateien)
+    bundle = getattr(load.func, "__self__", None)
+    return bundle if isinstance(bundle, ModelBundle) else None
+
+
+@dataclass
+class QuarantineEntry:
+    signature: tuple
+    reason: str
+    failures: int
+    retry_at: float
+
+
+class ModelRegistry:
+    # Prozessweiter Modell-Cache: jede Datei wird nur einmal pro (Pfad, mtime, Größe) geladen.
+    # Der aktuelle Stand ist ein Snapshot, der bei Änderungen komplett ersetzt wird –
+    # laufende Reruns behalten so ihre Version, niemand sieht einen halb aktualisierten Stand.
+    # Mit memory_budget (Bytes) werden selten genutzte Modelle per LRU verdrängt.
+
+    def __init__(self, model_dir=".", model_format="auto", settle_seconds=0.0, bundle_path=None,
+                 quarantine_backoff=30.0, quarantine_max_backoff=3600.0, prefix=MODEL_PREFIX, memory_budget=0):
+        # model_format: "bundle", "pickle", "native" oder "auto" (Bundle, falls vorhanden, sonst
+        # pro Parkplatz natives Modell bzw. pickle)
+        self.model_dir = model_dir
+        self.model_format = model_format
+        self.prefix = prefix
+        self.bundle_path = bundle_path or os.path.join(model_dir, DEFAULT_BUNDLE_NAME)
+        self._bundle = None
+        self._bundle_signature = None
+        self._bundles = set()   # geöffnete Bundles, auf die der Katalog noch verweist
+        self._retired = []      # nicht mehr referenzierte Bundles, werden beim nächsten refresh geschlossen
+        self.settle_seconds = settle_seconds
+        self._lock = threading.Lock()
+        self._cache = ModelCache(memory_budget)   # Signatur -> Modell, LRU mit Speicherbudget
+        # Snapshot (Parkplatz-Key -> Modell, Parkplatz-Key -> Grund der Nichtverfügbarkeit);
+        # wird als Ganzes ersetzt und nie verändert
+        self._snapshot = (LotModels(self, {}), {})
+        self._quarantine = {}   # Parkplatz-Key -> QuarantineEntry
+        self.quarantine_backoff = quarantine_backoff
+        self.quarantine_max_backoff = quarantine_max_backoff
+        # Wird nach dem Laden eines Modells aufgerufen, bevor es veröffentlicht wird (z. B. Warm-up)
+        self.on_load = None
+        self._watcher = None
+        self._stop = threading.Event()
+        self.version = 0
+
+    def _discover(self):
+        paths = {}
+        extensions = {"pickle": [PICKLE_EXT], "native": [NATIVE_EXT], "auto": [PICKLE_EXT, NATIVE_EXT]}
+        for ext in extensions.get(self.model_format, []):
+            for path in model_paths(self.model_dir, ext, self.prefix):
+                if ext == NATIVE_EXT and not os.path.exists(sidecar_path(path)):
+                    continue
+                paths[lot_key_from_path(path, self.prefix)] = path
+        return dict(sorted(paths.items()))
+
+    def _load(self, path, manifest=None):
+        # Bytes einmal lesen, gegen das SHA-256-Manifest prüfen und erst dann deserialisieren
+        with open(path, "rb") as f:
+            data = f.read()
+        verify_bytes(os.path.basename(path), data, manifest)
+        if path.endswith(NATIVE_EXT):
+            with open(sidecar_path(path), "rb") as f:
+                sidecar_data = f.read()
+            verify_bytes(os.path.basename(sidecar_path(path)), sidecar_data, manifest)
+            return booster_model_from_raw(data, parse_sidecar(sidecar_data, sidecar_path(path)))
+        return pickle.loads(data)
+
+    def _entries(self):
+        # Liefert (Parkplatz-Key, Signatur, Loader, fertig geschrieben?) für alle Modelle
+        if self.model_format == "bundle" or (self.model_format == "auto" and os.path.exists(self.bundle_path)):
+            signature = file_signature(self.bundle_path)
+            if self._bundle is None or self._bundle_signature != signature:
+                # Bundles werden per os.replace ausgetauscht, ein halb geschriebener Stand ist nie sichtbar
+                self._bundle = ModelBundle(self.bundle_path)
+                self._bundle_signature = signature
+                self._bundles.add(self._bundle)
+            bundle = self._bundle
+            for key in bundle.lots():
+                # Unveränderte Modelle (gleicher Booster und gleiches Schema) werden auch über Bundle-Versionen
+                # hinweg wiederverwendet
+                yield key, ("sha256", bundle.fingerprint(key)), functools.partial(bundle.load, key), True
+            return
+
+        self._bundle = None
+        self._bundle_signature = None
+        manifest = load_manifest(self.model_dir)
+        now = time.time()
+        for key, path in self._discover().items():
+            try:
+                signature = file_signature(path)
+            except FileNotFoundError:
+                continue
+            settled = now - max(signature[1::2]) / 1e9 >= self.settle_seconds
+            yield key, signature, functools.partial(self._load, path, manifest), settled
+
+    def refresh(self):
+        # Nur stat() pro Datei; neu geladen wird nur, was sich geändert hat. Neue Versionen werden
+        # sofort geladen (Integritätsprüfung, Warm-up) und landen im LRU-Cache.
+        with self._lock:
+            previous, previous_unavailable = self._snapshot
+            try:
+                entries = list(self._entries())
+            except LOAD_ERRORS as e:
+                logger.warning("Could not read model bundle %s (%s), keeping previous models", self.bundle_path, e)
+                return self
+            catalog = {}
+            now = time.time()
+            for key, signature, load, settled in entries:
+                known = previous.entry(key)
+                if known is not None and known[0] == signature:
+                    # Bereits geprüft; ist das Modell verdrängt, wird es bei Bedarf nachgeladen – bei einem
+                    # neuen Bundle aus diesem (gleiche Checksumme), damit das alte geschlossen werden kann
+                    catalog[key] = known if loader_bundle(known[1]) is loader_bundle(load) else (signature, load)
+                    self._quarantine.pop(key, None)
+                    continue
+                if signature not in self._cache:
+                    quarantined = self._quarantine.get(key)
+                    if not settled or (quarantined and quarantined.signature == signature and now < quarantined.retry_at):
+                        # Datei wird noch geschrieben oder steht in Quarantäne -> alte Version behalten
+                        if known is not None:
+                            catalog[key] = known
+                        continue
+                    try:
+                        model = load()
+                    except LOAD_ERRORS as e:
+                        self._quarantine_lot(key, signature, e, now)
+                        if known is not None:
+                            catalog[key] = known
+                        continue
+                    if self.on_load is not None:
+                        self.on_load(key, model)
+                    self._cache.put(signature, key, model)
+                self._quarantine.pop(key, None)
+                catalog[key] = (signature, load)
+            # Gelöschte Modelle auch aus der Quarantäne nehmen
+            present = {entry[0] for entry in entries}
+            self._quarantine = {k: q for k, q in self._quarantine.items() if k in present}
+            unavailable = {k: q.reason for k, q in self._quarantine.items() if k not in catalog}
+            self._cache.retain({signature for signature, _ in catalog.values()})
+            if previous.signatures() != {k: v[0] for k, v in catalog.items()} or unavailable != previous_unavailable:
+                self._snapshot = (LotModels(self, catalog), unavailable)
+                self.version += 1
+            elif any(entry is not previous.entry(key) for key, entry in catalog.items()):
+                # Nur Loader auf ein neues Bundle umgehängt, Modelle unverändert -> gleiche Version
+                self._snapshot = (LotModels(self, catalog), unavailable)
+            self._close_unused_bundles(catalog)
+        return self
+
+    def _close_unused_bundles(self, catalog):
+        # Erst einen refresh später schließen: Reruns mit dem vorigen Snapshot lesen evtl. noch daraus
+        retired = []
+        for bundle in self._retired:
+            try:
+                bundle.close()
+            except BufferError:
+                # Ein Blob wird gerade noch gelesen -> beim nächsten Mal
+                retired.append(bundle)
+        used = {loader_bundle(load) for _, load in catalog.values()} | {self._bundle}
+        unused = self._bundles - used
+        self._bundles -= unused
+        self._retired = retired + list(unused)
+
+    def _resolve(self, key, signature, load):
+        model = self._cache.get(signature)
+        if model is None:
+            # Vom LRU verdrängt -> aus Datei bzw. Bundle nachladen; gleichzeitige Sessions warten auf einen Ladevorgang
+            try:
+                model = single_flight.do(("model", signature), load)
+            except LOAD_ERRORS as e:
+                logger.warning("Could not reload model %s (%s)", key, e)
+                return None
+            self._cache.put(signature, key, model)
+        return model
+
+    def pin(self, lot_key, seconds=300):
+        # Parkplatz für die angegebene Zeit vor Verdrängung schützen (z. B. aktuelle Auswahl)
+        self._cache.pin(lot_key, seconds)
+
+    def cache_stats(self):
+        return self._cache.stats()
+
+    def _quarantine_lot(self, key, signature, error, now):
+        # Exponentielles Backoff pro Datei-Version; eine neue Version wird sofort wieder versucht
+        previous = self._quarantine.get(key)
+        failures = previous.failures + 1 if previous and previous.signature == signature else 1
+        delay = min(self.quarantine_backoff * 2 ** (failures - 1), self.quarantine_max_backoff)
+        self._quarantine[key] = QuarantineEntry(signature, f"{type(error).__name__}: {error}", failures, now + delay)
+        logger.warning("Quarantined model %s after %d failed load(s), retry in %.0fs: %s", key, failures, delay, error)
+
+    def start_watcher(self, interval):
+        # Hintergrund-Thread, der das Modellverzeichnis periodisch abfragt
+        if self._watcher is not None or interval <= 0:
+            return self
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Model reload failed")
+
+        self._watcher = threading.Thread(target=run, name="model-registry-watcher", daemon=True)
+        self._watcher.start()
+        return self
+
+    def stop_watcher(self):
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+
+    def get(self, lot_key):
+        return self._snapshot[0].get(lot_key)
+
+    def all(self):
+        # Snapshot (Mapping) zurückgeben; Modelle werden beim Zugriff über den Cache aufgelöst
+        return self._snapshot[0]
+
+    def keys(self):
+        return list(self._snapshot[0])
+
+    def unavailable(self):
+        # Parkplätze, deren Modell in Quarantäne ist und für die keine ältere Version vorliegt
+        return self._snapshot[1]
+
+    def snapshot(self):
+        # Modelle und nicht verfügbare Parkplätze aus demselben Stand
+        return self._snapshot
+
+    def quarantined(self):
+        return dict(self._quarantine)
@@ -0,0 +1,148 @@
+import argparse
+import json
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from mappings import name_mapping
+from model_files import NATIVE_EXT, PICKLE_EXT, SIDECAR_EXT, lot_key_from_path, model_paths
+
+# Natives XGBoost-Format (UBJSON) plus Sidecar mit dem Feature-Schema.
+# Beim Laden wird nur ein Booster gebaut, ohne sklearn-Wrapper und ohne pickle.
+SIDECAR_VERSION = 1
+CATEGORICAL_TYPE = "c"
+
+
+def sidecar_path(model_path):
+    return os.path.splitext(model_path)[0] + SIDECAR_EXT
+
+
+def category_dtypes(categories):
+    # Trainings-Levels -> feste CategoricalDtype pro Feature; einmal beim Laden gebaut
+    return {name: levels if isinstance(levels, pd.CategoricalDtype) else pd.CategoricalDtype(levels)
+            for name, levels in (categories or {}).items()}
+
+
+def apply_categories(frame, categories):
+    # Kategoriale Spalten mit den Trainings-Levels codieren, damit die Codes zum Modell passen.
+    # Spalten, die schon den richtigen Typ haben, bleiben unverändert (keine Kopie)
+    dtypes = category_dtypes(categories)
+    pending = {name: dtype for name, dtype in dtypes.items()
+               if name in frame.columns and frame[name].dtype != dtype}
+    return frame.astype(pending) if pending else frame
+
+
+class BoosterModel:
+    # Schlanker Ersatz für den sklearn-Wrapper: bietet feature_names_in_ und predict()
+
+    def __init__(self, booster, feature_names, feature_types, categories=None, best_iteration=None):
+        self.booster = booster
+        self.feature_names_in_ = np.asarray(feature_names, dtype=object)
+        self.feature_types = list(feature_types)
+        self.categories = categories or {}
+        self.category_dtypes = category_dtypes(self.categories)
+        self.best_iteration = best_iteration
+
+    def predict(self, X):
+        if self.category_dtypes:
+            X = apply_categories(X, self.category_dtypes)
+        iteration_range = (0, self.best_iteration + 1) if self.best_iteration is not None else (0, 0)
+        return self.booster.inplace_predict(X, iteration_range=iteration_range)
+
+
+def _category_levels(frame, feature_names, feature_types):
+    levels = {}
+    for name, ftype in zip(feature_names, feature_types):
+        if ftype != CATEGORICAL_TYPE or frame is None or name not in frame.columns:
+            continue
+        column = frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Reihenfolge der Levels bestimmt die Codes -> unverändert übernehmen
+            levels[name] = [str(v) for v in column.cat.categories]
+        else:
+            # astype("category") beim Training sortiert die Levels ebenso
+            levels[name] = sorted(str(v) for v in column.dropna().unique())
+    return levels
+
+
+def lot_training_rows(training_data, lot_key):
+    # Pro-Parkplatz-Modelle wurden nur auf den Zeilen ihres Parkplatzes trainiert -> nur deren Levels übernehmen
+    if training_data is None or "Name" not in training_data.columns:
+        return training_data
+    return training_data[training_data["Name"] == name_mapping.get(lot_key, lot_key)]
+
+
+def pickle_schema(model, training_data=None):
+    # Booster und Sidecar-Schema eines gepickelten Modells; Kategorie-Levels nur mit Trainingsdaten, sonst null
+    booster = model.get_booster() if hasattr(model, "get_booster") else model
+    feature_names = getattr(model, "feature_names_in_", None)
+    feature_names = list(feature_names) if feature_names is not None else list(booster.feature_names or [])
+    feature_types = list(booster.feature_types or ["float"] * len(feature_names))
+    best_iteration = booster.attr("best_iteration")
+    return booster, {
+        "format_version": SIDECAR_VERSION,
+        "xgboost_version": xgb.__version__,
+        "feature_names": feature_names,
+        "feature_types": feature_types,
+        "categories": _category_levels(training_data, feature_names, feature_types) if training_data is not None else None,
+        "best_iteration": int(best_iteration) if best_iteration is not None else None,
+    }
+
+
+def convert_pickle(pkl_path, out_dir=None, training_data=None):
+    # xgb_model_<lot>.pkl -> xgb_model_<lot>.ubj + xgb_model_<lot>.json
+    with open(pkl_path, "rb") as f:
+        model = pickle.load(f)
+    base = os.path.splitext(os.path.basename(pkl_path))[0]
+    booster, sidecar = pickle_schema(model, lot_training_rows(training_data, lot_key_from_path(pkl_path)))
+
+    out_dir = out_dir or os.path.dirname(pkl_path) or "."
+    model_path = os.path.join(out_dir, base + NATIVE_EXT)
+    booster.save_model(model_path)
+    with open(sidecar_path(model_path), "w", encoding="utf-8") as f:
+        json.dump(sidecar, f, ensure_ascii=False, indent=2)
+    return model_path
+
+
+def parse_sidecar(data, source="sidecar"):
+    sidecar = json.loads(data)
+    if sidecar.get("format_version") != SIDECAR_VERSION:
+        raise ValueError(f"Unsupported sidecar version in {source}")
+    return sidecar
+
+
+def booster_model_from_raw(raw, schema):
+    # raw: UBJSON-Bytes des Boosters, schema: Sidecar bzw. Bundle-Manifest-Eintrag
+    booster = xgb.Booster()
+    booster.load_model(bytearray(raw))
+    booster.feature_names = schema["feature_names"]
+    booster.feature_types = schema["feature_types"]
+    return BoosterModel(
+        booster,
+        schema["feature_names"],
+        schema["feature_types"],
+        categories=schema.get("categories"),
+        best_iteration=schema.get("best_iteration"),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert pickled xgb_model_*.pkl files to native UBJSON boosters")
+    parser.add_argument("paths", nargs="*", help="model pickles (default: all xgb_model_*.pkl in --model-dir)")
+    parser.add_argument("--model-dir", default=".")
+    parser.add_argument("--out-dir", default=None, help="target directory (default: next to the pickle)")
+    parser.add_argument("--training-data", default=None,
+                        help="CSV with the training rows (all lots), used to record the category levels")
+    args = parser.parse_args()
+
+    paths = args.paths or model_paths(args.model_dir, PICKLE_EXT)
+    training_data = pd.read_csv(args.training_data) if args.training_data else None
+    for path in paths:
+        print(f"{path} -> {convert_pickle(path, args.out_dir, training_data)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+# Aufräumen abgelaufener Einträge höchstens so oft (Sekunden)
+PURGE_INTERVAL = 60.0
+
+
+def model_fingerprint(*parts):
+    # Modellstand aus der Katalog-Signatur (Pfad/mtime/Größe der Datei bzw. SHA-256 im Bundle) und dem Modus.
+    # Anders als ModelRegistry.version (Zähler pro Prozess) gilt er für alle Prozesse, die sich die SQLite-Datei teilen.
+    return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def prediction_key(lot_key, slot, weather, in_event_window, event_size, model_fingerprint):
+    # Gleicher Parkplatz, gleicher 5-Minuten-Slot, gleiches Stundenwetter und gleiche Event-Angaben
+    # ergeben dieselbe Vorhersage; der Modellstand macht Einträge nach einem Reload ungültig
+    return (lot_key, slot.isoformat(), float(weather["temperature"]), float(weather["humidity"]),
+            float(weather["rain"]), weather["description"], int(in_event_window), event_size, model_fingerprint)
+
+
+class PredictionCache:
+    # Prozessweiter Memo-Cache für einzelne Vorhersagen mit TTL (an das stündliche Wetter gekoppelt).
+    # Optional zusätzlich in einer SQLite-Datei, die sich mehrere Streamlit-Prozesse teilen können.
+
+    def __init__(self, ttl=3600.0, path=None):
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}   # Schlüssel -> (Vorhersage, läuft ab um time.time())
+        self._last_purge = time.time()
+        self.hits = 0
+        self.misses = 0
+        self._db = None
+        if path and ttl > 0:
+            self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS predictions (key TEXT PRIMARY KEY, value REAL, expires REAL)")
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self.hits += 1
+                return entry[0]
+            if self._db is not None:
+                row = self._db.execute("SELECT value, expires FROM predictions WHERE key = ? AND expires > ?",
+                                       (json.dumps(key), now)).fetchone()
+                if row is not None:
+                    # Als float32 zurück, wie aus predict() – sonst könnte die Anzeige um einen Prozentpunkt abweichen
+                    self._entries[key] = (np.float32(row[0]), row[1])
+                    self.hits += 1
+                    return self._entries[key][0]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        self.put_many({key: value})
+
+    def put_many(self, items):
+        if self.ttl <= 0:
+            return
+        now = time.time()
+        expires = now + self.ttl
+        with self._lock:
+            for key, value in items.items():
+                self._entries[key] = (value, expires)
+            if self._db is not None:
+                self._db.executemany("INSERT OR REPLACE INTO predictions VALUES (?, ?, ?)",
+                                     [(json.dumps(key), float(value), expires) for key, value in items.items()])
+            if now - self._last_purge >= PURGE_INTERVAL:
+                self._purge(now)
+
+    def _purge(self, now):
+        self._entries = {key: entry for key, entry in self._entries.items() if entry[1] > now}
+        if self._db is not None:
+            self._db.execute("DELETE FROM predictions WHERE expires <= ?", (now,))
+        self._last_purge = now
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else None,
+                "ttl_seconds": self.ttl,
+                "disk": self.path if self._db is not None else None,
+            }
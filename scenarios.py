@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from inference import clip_prediction, predict_columns
+
+# Was-wäre-wenn für einen Parkplatz: alle Event-Größen × Wetter-Varianten in einem predict-Aufruf
+EVENT_SCENARIOS = {
+    "No event": (0, None),
+    "Small event": (1, "small"),
+    "Medium event": (1, "medium"),
+    "Large event": (1, "large"),
+}
+# Modelle ohne gespeicherte Kategorien (alte pickles) geben jeder Event-Größe denselben Code -> nur mit/ohne Event
+EVENT_ONLY_SCENARIOS = {
+    "No event": (0, None),
+    "Event (any size)": (1, "medium"),
+}
+# Änderungen gegenüber der Wettervorhersage; Regen und Luftfeuchtigkeit bleiben im gültigen Bereich
+WEATHER_SCENARIOS = {
+    "As forecast": {},
+    "Rain +5 mm": {"rain": 5.0},
+    "Temperature −5 °C": {"temperature": -5.0},
+    "Temperature +5 °C": {"temperature": 5.0},
+    "Humidity +20 %": {"humidity": 20.0},
+}
+BASELINE = ("As forecast", "No event")
+
+
+def perturb(weather, changes):
+    weather = dict(weather)
+    for name, delta in changes.items():
+        weather[name] = float(weather[name]) + delta
+    weather["rain"] = max(float(weather["rain"]), 0.0)
+    weather["humidity"] = min(max(float(weather["humidity"]), 0.0), 100.0)
+    return weather
+
+
+def distinguishes_event_size(model):
+    return "event_size" in (getattr(model, "category_dtypes", None) or {})
+
+
+def scenario_table(model, table, key, weather, times, weather_scenarios=("As forecast",), engine="xgboost"):
+    # Zeilen = Wetter-Varianten, Spalten = Event-Szenarien, Werte = Vorhersage (0–1, wie in der App gerundet)
+    weather_scenarios = [name for name in WEATHER_SCENARIOS if name in weather_scenarios or name == BASELINE[0]]
+    events = EVENT_SCENARIOS if distinguishes_event_size(model) else EVENT_ONLY_SCENARIOS
+    combos = [(w, e) for w in weather_scenarios for e in events]
+    weathers = [perturb(weather, WEATHER_SCENARIOS[w]) for w, _ in combos]
+    columns = table.lot_columns(
+        key, len(combos),
+        {name: [w[name] for w in weathers] for name in ("temperature", "description", "humidity", "rain")},
+        times,
+        [events[e][0] for _, e in combos],
+        [events[e][1] for _, e in combos],
+    )
+    predictions = predict_columns(model, columns, slice(None), engine)
+    values = pd.Series(np.array([clip_prediction(p) for p in predictions], dtype=np.float32),
+                       index=pd.MultiIndex.from_tuples(combos))
+    return values.unstack()[list(events)].loc[weather_scenarios]
+
+
+def scenario_labels(scenarios):
+    # Anzeige wie bei den KPIs ("23%") plus Differenz zum Basisfall (Vorhersage-Wetter, kein Event) in Prozentpunkten
+    percent = (scenarios * 100).astype(int)
+    baseline = percent.loc[BASELINE[0], BASELINE[1]]
+    return percent.apply(lambda column: [f"{p}%" if p == baseline and (w, column.name) == BASELINE
+                                         else f"{p}% ({p - baseline:+d})" for w, p in column.items()])
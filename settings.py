@@ -0,0 +1,61 @@
+import os
+
+# Konfiguration über Umgebungsvariablen, Defaults passen für den Devcontainer
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MODEL_DIR = os.environ.get("PARKING_MODEL_DIR", BASE_DIR)
+# "auto": Bundle (siehe model_bundle.py) falls vorhanden, sonst pro Parkplatz natives .ubj-Modell
+# (siehe native_models.py) bzw. .pkl; "bundle", "native" oder "pickle" erzwingen
+MODEL_FORMAT = os.environ.get("PARKING_MODEL_FORMAT", "auto")
+MODEL_BUNDLE = os.environ.get("PARKING_MODEL_BUNDLE", os.path.join(MODEL_DIR, "models.bundle"))
+# "per_lot": ein Modell pro Parkplatz; "global": ein Modell für alle Parkplätze (siehe global_model.py)
+MODEL_MODE = os.environ.get("PARKING_MODEL_MODE", "per_lot")
+MODEL_CITY = os.environ.get("PARKING_MODEL_CITY", "dresden")
+# Auswertung der Bäume: "xgboost" oder "numpy" (reine NumPy-Auswertung, siehe tree_engine.py)
+PREDICT_ENGINE = os.environ.get("PARKING_PREDICT_ENGINE", "xgboost")
+# Abfrageintervall des Modell-Watchers in Sekunden (0 = kein Hot-Reload)
+MODEL_RELOAD_INTERVAL = float(os.environ.get("PARKING_MODEL_RELOAD_INTERVAL", 30))
+# Dateien, die jünger sind, werden evtl. noch geschrieben und erst beim nächsten Durchlauf geladen
+MODEL_SETTLE_SECONDS = float(os.environ.get("PARKING_MODEL_SETTLE_SECONDS", 2))
+# Speicherbudget für geladene Modelle in MB (0 = alle Modelle im Speicher halten); darüber wird per LRU verdrängt
+MODEL_MEMORY_BUDGET_MB = float(os.environ.get("PARKING_MODEL_MEMORY_BUDGET_MB", 0))
+# So lange bleibt der zuletzt gewählte Parkplatz einer Session vor Verdrängung geschützt
+MODEL_PIN_SECONDS = float(os.environ.get("PARKING_MODEL_PIN_SECONDS", 300))
+# Backoff für Modelle in Quarantäne (Checksumme falsch / nicht ladbar): Start- und Maximalwert in Sekunden
+MODEL_QUARANTINE_BACKOFF = float(os.environ.get("PARKING_MODEL_QUARANTINE_BACKOFF", 30))
+MODEL_QUARANTINE_MAX_BACKOFF = float(os.environ.get("PARKING_MODEL_QUARANTINE_MAX_BACKOFF", 3600))
+# Vorberechnetes Vorhersage-Raster (alle Parkplätze × 5-Minuten-Slots, ohne Event): Neuberechnung alle N Minuten
+# (0 = aus, jede Seite rechnet selbst)
+FORECAST_GRID_INTERVAL = float(os.environ.get("PARKING_FORECAST_GRID_INTERVAL", 10))
+# Memo-Cache für Einzelvorhersagen: Lebensdauer in Sekunden (0 = aus), passend zum stündlichen Wetter;
+# optional zusätzlich als SQLite-Datei, die sich mehrere Prozesse auf einem Host teilen
+PREDICTION_CACHE_TTL = float(os.environ.get("PARKING_PREDICTION_CACHE_TTL", 3600))
+PREDICTION_CACHE_PATH = os.environ.get("PARKING_PREDICTION_CACHE_PATH", "")
+# Micro-Batching über Sessions hinweg: Vorhersage-Anfragen bis zu N ms sammeln und pro Parkplatz gemeinsam rechnen
+# (0 = aus, jede Session rechnet selbst); höchstens MAX_SIZE Anfragen pro Runde
+PREDICT_BATCH_MAX_WAIT_MS = float(os.environ.get("PARKING_PREDICT_BATCH_MAX_WAIT_MS", 2))
+PREDICT_BATCH_MAX_SIZE = int(os.environ.get("PARKING_PREDICT_BATCH_MAX_SIZE", 256))
+# Last mehrerer Sessions begrenzen (siehe inference.py, Benchmark: python inference.py --sessions 8,32):
+# OpenMP-Threads pro predict-Aufruf (0 = xgboost-Standard, alle Kerne) und gleichzeitige predict-Aufrufe (0 = unbegrenzt)
+PREDICT_NTHREAD = int(os.environ.get("PARKING_PREDICT_NTHREAD", 0))
+PREDICT_MAX_CONCURRENCY = int(os.environ.get("PARKING_PREDICT_MAX_CONCURRENCY", 0))
+# Wetter (open-meteo): Antwort gilt N Sekunden, danach wird sie im Hintergrund erneuert und bis dahin weiter genutzt;
+# Timeout pro Abruf in Sekunden, Anzahl Wiederholungen und Start-Backoff in Sekunden (verdoppelt sich)
+WEATHER_TTL = float(os.environ.get("PARKING_WEATHER_TTL", 600))
+WEATHER_TIMEOUT = float(os.environ.get("PARKING_WEATHER_TIMEOUT", 5))
+WEATHER_RETRIES = int(os.environ.get("PARKING_WEATHER_RETRIES", 2))
+WEATHER_BACKOFF = float(os.environ.get("PARKING_WEATHER_BACKOFF", 0.5))
+# Nach einem gescheiterten Abruf (noch ohne Wetter) N Sekunden lang nicht synchron neu laden, Standardwetter nutzen
+WEATHER_RETRY_AFTER = float(os.environ.get("PARKING_WEATHER_RETRY_AFTER", 60))
+# Wetter im Hintergrund alle N Sekunden (+ zufällig bis JITTER) neu laden, damit keine Seite auf das Netz wartet
+# (0 = aus, nur bei Bedarf nach Ablauf von WEATHER_TTL); sollte kleiner als WEATHER_TTL sein
+WEATHER_PREFETCH_INTERVAL = float(os.environ.get("PARKING_WEATHER_PREFETCH_INTERVAL", 300))
+WEATHER_PREFETCH_JITTER = float(os.environ.get("PARKING_WEATHER_PREFETCH_JITTER", 30))
+# Wetter pro Parkplatz: Kantenlänge der Rasterzellen in Grad (Parkplätze einer Zelle teilen sich eine Reihe,
+# alle Zellen in einer Anfrage); 0 = ein Ort (Stadtmitte) für alle Parkplätze
+WEATHER_CELL_DEGREES = float(os.environ.get("PARKING_WEATHER_CELL_DEGREES", 0.02))
+# Wetterquelle: "open-meteo" (live, Basis-URL änderbar, z. B. auf den lokalen Stub aus weather_replay.py) oder
+# "replay" (aufgezeichnete Antworten aus WEATHER_FIXTURE, siehe python weather_replay.py record)
+WEATHER_PROVIDER = os.environ.get("PARKING_WEATHER_PROVIDER", "open-meteo")
+WEATHER_BASE_URL = os.environ.get("PARKING_WEATHER_BASE_URL", "https://api.open-meteo.com/v1/forecast")
+WEATHER_FIXTURE = os.environ.get("PARKING_WEATHER_FIXTURE", os.path.join(BASE_DIR, "weather_fixture.json"))
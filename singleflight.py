@@ -0,0 +1,54 @@
+import threading
+from collections import Counter
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    # Gleiche, gleichzeitig laufende Berechnungen nur einmal ausführen: wer denselben Schlüssel anfragt,
+    # während die Berechnung läuft, wartet auf deren Ergebnis (bzw. Fehler). Schlüssel sind Tupel, deren
+    # erstes Element die Art angibt ("weather", "model", "prediction") – danach sind die Zähler gruppiert.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}   # Schlüssel -> Future der laufenden Berechnung
+        self.calls = Counter()
+        self.coalesced = Counter()
+
+    def do(self, key, fn):
+        return self.do_many([key], lambda keys: {key: fn()})[key]
+
+    def do_many(self, keys, fn):
+        # fn bekommt nur die Schlüssel, die gerade niemand sonst berechnet, und liefert dict Schlüssel -> Ergebnis
+        own, waiting = {}, {}
+        with self._lock:
+            for key in keys:
+                self.calls[key[0]] += 1
+                if key in self._calls:
+                    waiting[key] = self._calls[key]
+                    self.coalesced[key[0]] += 1
+                elif key not in own:
+                    own[key] = self._calls[key] = Future()
+        try:
+            results = fn(list(own)) if own else {}
+            for key, future in own.items():
+                future.set_result(results[key])
+        except BaseException as exc:
+            for future in own.values():
+                if not future.done():
+                    future.set_exception(exc)
+            raise
+        finally:
+            with self._lock:
+                for key in own:
+                    del self._calls[key]
+        results = {key: future.result() for key, future in own.items()}
+        results.update((key, future.result()) for key, future in waiting.items())
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {kind: {"calls": self.calls[kind], "coalesced": self.coalesced[kind]} for kind in sorted(self.calls)}
+
+
+# Prozessweit geteilt (Wetter, Modell-Nachladen, Vorhersagen pro Slot)
+single_flight = SingleFlight()
@@ -0,0 +1,226 @@
+import argparse
+import json
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from native_models import apply_categories
+
+# Reine NumPy-Auswertung der XGBoost-Bäume für kleine Batches (1 bis ein paar hundert Zeilen).
+# Die Bäume eines Boosters werden in flache Arrays exportiert und für alle Bäume gleichzeitig
+# Ebene für Ebene durchlaufen – ohne DMatrix und ohne den Aufruf-Overhead von xgboost.
+# Nur Objectives ohne Ausgabe-Transformation, damit das Ergebnis bitgenau mit xgboost übereinstimmt
+IDENTITY_OBJECTIVES = {"reg:squarederror", "reg:absoluteerror", "reg:pseudohubererror"}
+
+
+def _parse_float(value):
+    # base_score steht je nach xgboost-Version als "5E-1" oder "[5E-1]" im JSON
+    return float(str(value).strip("[]"))
+
+
+class TreeEnsemble:
+
+    def __init__(self, trees, base_score, objective):
+        if objective not in IDENTITY_OBJECTIVES:
+            raise ValueError(f"Objective {objective} is not supported by the numpy engine")
+        self.objective = objective
+        self.base_score = np.float32(base_score)
+
+        left, right, feature, threshold, default_left, categorical, roots = [], [], [], [], [], [], []
+        cat_sets = {}
+        offset = 0
+        max_depth = 0
+        for tree in trees:
+            n = len(tree["left_children"])
+            lc = np.asarray(tree["left_children"], dtype=np.int64)
+            rc = np.asarray(tree["right_children"], dtype=np.int64)
+            # Blätter zeigen auf sich selbst, so bleiben sie nach dem Erreichen stabil
+            own = np.arange(n, dtype=np.int64)
+            left.append(np.where(lc == -1, own, lc) + offset)
+            right.append(np.where(rc == -1, own, rc) + offset)
+            feature.append(np.asarray(tree["split_indices"], dtype=np.int64))
+            threshold.append(np.asarray(tree["split_conditions"], dtype=np.float32))
+            default_left.append(np.asarray(tree["default_left"], dtype=bool))
+            categorical.append(np.asarray(tree.get("split_type", [0] * n), dtype=bool))
+            segments = tree.get("categories_segments", [])
+            sizes = tree.get("categories_sizes", [])
+            for node, start, size in zip(tree.get("categories_nodes", []), segments, sizes):
+                cat_sets[offset + node] = tree["categories"][start:start + size]
+            roots.append(offset)
+            max_depth = max(max_depth, self._depth(lc, rc))
+            offset += n
+
+        self.left = np.concatenate(left) if left else np.zeros(0, dtype=np.int64)
+        self.right = np.concatenate(right) if right else np.zeros(0, dtype=np.int64)
+        self.feature = np.concatenate(feature) if feature else np.zeros(0, dtype=np.int64)
+        # Blattwerte stehen bei xgboost in split_conditions
+        self.value = np.concatenate(threshold) if threshold else np.zeros(0, dtype=np.float32)
+        self.default_left = np.concatenate(default_left) if default_left else np.zeros(0, dtype=bool)
+        self.is_leaf = self.left == np.arange(len(self.left))
+        self.roots = np.asarray(roots, dtype=np.int64)
+        self.max_depth = max_depth
+
+        # Kategoriale Splits als dichte Matrix: Zeile = Split-Knoten, Spalte = Kategorie-Code.
+        # Kategorien im Set gehen nach rechts, alle anderen (auch unbekannte Codes) nach links.
+        categorical = np.concatenate(categorical) if categorical else np.zeros(0, dtype=bool)
+        self.cat_row = np.full(len(self.left), -1, dtype=np.int64)
+        width = max((max(c) for c in cat_sets.values() if c), default=-1) + 1
+        self.cat_matrix = np.zeros((max(len(cat_sets), 1), max(width, 1)), dtype=bool)
+        for row, (node, cats) in enumerate(sorted(cat_sets.items())):
+            self.cat_row[node] = row
+            self.cat_matrix[row, cats] = True
+        self.is_categorical = categorical & (self.cat_row >= 0)
+
+    @staticmethod
+    def _depth(left, right):
+        depth = np.zeros(len(left), dtype=np.int64)
+        for node in range(len(left)):
+            if left[node] != -1:
+                depth[left[node]] = depth[node] + 1
+                depth[right[node]] = depth[node] + 1
+        return int(depth.max()) if len(depth) else 0
+
+    @classmethod
+    def from_booster(cls, booster, best_iteration=None):
+        model = json.loads(booster.save_raw("json"))
+        learner = model["learner"]
+        gbm = learner["gradient_booster"]
+        if gbm.get("name") != "gbtree" or int(learner["learner_model_param"].get("num_target", 1)) != 1:
+            raise ValueError("Only single-target gbtree boosters are supported by the numpy engine")
+        trees = gbm["model"]["trees"]
+        if best_iteration is not None:
+            indptr = gbm["model"].get("iteration_indptr")
+            trees = trees[:indptr[best_iteration + 1]] if indptr else trees[:best_iteration + 1]
+        return cls(trees, _parse_float(learner["learner_model_param"]["base_score"]), learner["objective"]["name"])
+
+    def predict_matrix(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        n_rows = X.shape[0]
+        rows = np.arange(n_rows)[:, None]
+        nodes = np.broadcast_to(self.roots, (n_rows, len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            fvalue = X[rows, self.feature[nodes]]
+            missing = np.isnan(fvalue)
+            go_left = fvalue < self.value[nodes]
+            cat_nodes = self.is_categorical[nodes]
+            if cat_nodes.any():
+                codes = np.where(missing | ~cat_nodes, 0, fvalue).astype(np.int64)
+                in_range = (codes >= 0) & (codes < self.cat_matrix.shape[1])
+                in_set = np.zeros_like(cat_nodes)
+                in_set[in_range] = self.cat_matrix[self.cat_row[nodes][in_range], codes[in_range]]
+                go_left = np.where(cat_nodes, ~in_set, go_left)
+            go_left = np.where(missing, self.default_left[nodes], go_left)
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        # Summation in float32 und in Baumreihenfolge wie im CPU-Predictor von xgboost
+        leaves = np.concatenate([np.full((n_rows, 1), self.base_score, dtype=np.float32), self.value[nodes]], axis=1)
+        return np.cumsum(leaves, axis=1, dtype=np.float32)[:, -1]
+
+
+def frame_to_matrix(frame):
+    # Gleiche Codierung wie xgboost bei pandas-Eingaben: kategoriale Spalten über ihre Codes, -1 = fehlend
+    X = np.empty((len(frame), frame.shape[1]), dtype=np.float32)
+    for i, (_, column) in enumerate(frame.items()):
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy()
+            X[:, i] = np.where(codes < 0, np.nan, codes)
+        else:
+            X[:, i] = pd.to_numeric(column, errors="coerce").to_numpy(dtype=np.float32, na_value=np.nan)
+    return X
+
+
+class NumpyTreeModel:
+    # Gleiche Schnittstelle wie das xgboost-Modell (feature_names_in_, predict), aber ohne xgboost im Predict-Pfad
+
+    def __init__(self, model):
+        booster = model.get_booster() if hasattr(model, "get_booster") else model.booster
+        try:
+            best_iteration = model.best_iteration
+        except AttributeError:
+            best_iteration = None
+        self.ensemble = TreeEnsemble.from_booster(booster, best_iteration)
+        self.feature_names_in_ = model.feature_names_in_
+        self.category_dtypes = getattr(model, "category_dtypes", None) or {}
+
+    def predict(self, X):
+        if self.category_dtypes:
+            X = apply_categories(X, self.category_dtypes)
+        return self.ensemble.predict_matrix(frame_to_matrix(X))
+
+
+_compiled = weakref.WeakKeyDictionary()
+
+
+def numpy_model(model):
+    # Kompilierte Bäume pro Modellobjekt cachen; nach einem Hot-Reload wird das neue Modell neu exportiert
+    compiled = _compiled.get(model)
+    if compiled is None:
+        compiled = _compiled[model] = NumpyTreeModel(model)
+    return compiled
+
+
+def test_grid(key, model, n_rows=2000, seed=0):
+    # Zufälliges Raster über die Eingaben der App; Kategorien mit allen bekannten Levels, damit Splits greifen
+    from mappings import (capacity_mapping, distance_mapping, district_mapping, event_size_values,
+                          name_mapping, type_mapping, weather_code_mapping)
+    rng = np.random.default_rng(seed)
+    name = name_mapping.get(key, key)
+    frame = pd.DataFrame({
+        "Name": name,
+        "Capacity": float(capacity_mapping.get(key, 0)),
+        "Temperature": rng.uniform(-15, 38, n_rows),
+        "Description": rng.choice(list(weather_code_mapping.values()) + ["Unknown"], n_rows),
+        "Humidity": rng.uniform(10, 100, n_rows),
+        "Rain": np.round(rng.exponential(0.8, n_rows), 1),
+        "District": district_mapping.get(key, "Unbekannt"),
+        "Type": type_mapping.get(name, "Unbekannt"),
+        "final_avg_occ": rng.uniform(0, 1, n_rows),
+        "in_event_window": rng.integers(0, 2, n_rows),
+        "event_size": rng.choice([x for x in event_size_values if x] + [None], n_rows),
+        "distance_to_nearest_parking": float(distance_mapping.get(name, 0.0)),
+        "hour": rng.integers(0, 24, n_rows).astype(float),
+        "minute_of_day": rng.integers(0, 288, n_rows) * 5.0,
+        "weekday": rng.integers(0, 7, n_rows).astype(float),
+        "is_weekend": rng.integers(0, 2, n_rows).astype(float),
+        "is_holiday": rng.integers(0, 2, n_rows).astype(float),
+    })
+    frame = frame[list(model.feature_names_in_)]
+    for col in frame.select_dtypes(include=["object"]).columns:
+        frame[col] = frame[col].astype("category")
+    return frame
+
+
+def validate(models, n_rows=2000):
+    # Bit-für-Bit-Vergleich mit model.predict; Rückgabe: Parkplatz -> Anzahl abweichender Zeilen
+    mismatches = {}
+    for key, model in models.items():
+        frame = test_grid(key, model, n_rows)
+        expected = np.asarray(model.predict(frame), dtype=np.float32)
+        actual = numpy_model(model).predict(frame)
+        mismatches[key] = int(np.sum(expected.view(np.uint32) != actual.view(np.uint32)))
+        # Einzelzeilen wie in der App
+        for i in range(0, n_rows, max(n_rows // 20, 1)):
+            row = frame.iloc[[i]]
+            if np.float32(model.predict(row)[0]).view(np.uint32) != numpy_model(model).predict(row)[0].view(np.uint32):
+                mismatches[key] += 1
+    return mismatches
+
+
+def main():
+    from model_registry import ModelRegistry
+
+    parser = argparse.ArgumentParser(description="Validate the numpy tree engine bit-for-bit against xgboost")
+    parser.add_argument("--model-dir", default=".")
+    parser.add_argument("--rows", type=int, default=2000)
+    args = parser.parse_args()
+
+    models = ModelRegistry(args.model_dir).refresh().all()
+    mismatches = validate(models, args.rows)
+    for key, count in sorted(mismatches.items()):
+        print(f"{key}: {'OK' if count == 0 else f'{count} mismatches'}")
+    if any(mismatches.values()):
+        raise SystemExit("numpy engine differs from xgboost")
+
+
+if __name__ == "__main__":
+    main()
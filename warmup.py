@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytz
+
+from features import DEFAULT_WEATHER, lot_feature_table, time_features
+from inference import predict_columns
+from mappings import name_mapping
+
+logger = logging.getLogger(__name__)
+
+
+def warm_model(key, model, engine="xgboost"):
+    # Synthetische Vorhersage aus den Mapping-Tabellen über denselben Pfad wie die Seite (predict_columns):
+    # initialisiert OpenMP-Threadpool, Booster und DensePredictor, bevor ein echter Nutzer kommt
+    times = time_features(datetime.now(timezone.utc).astimezone(pytz.timezone("Europe/Berlin")))
+    table = lot_feature_table(tuple(name_mapping))
+    columns = table.columns(DEFAULT_WEATHER, times)
+    if key in table.positions:
+        i = table.positions[key]
+        predict_columns(model, columns, slice(i, i + 1), engine)
+    else:
+        # Globales Modell: alle Parkplätze in einem Aufruf, wie auf der Seite
+        predict_columns(model, columns, slice(None), engine)
+
+
+class ModelWarmup:
+    # Lädt beim Prozessstart alle Modelle, wärmt sie auf und meldet danach "ready".
+    # Modelle, die später per Hot-Reload dazukommen, wärmt die Registry über on_load selbst auf.
+
+    def __init__(self, registry, engine="xgboost", reload_interval=0):
+        self.registry = registry
+        self.engine = engine
+        self.reload_interval = reload_interval
+        self.loaded = 0
+        self.error = None
+        self.duration = None
+        self._ready = threading.Event()
+        registry.on_load = self._on_load
+        self._thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _on_load(self, key, model):
+        try:
+            warm_model(key, model, self.engine)
+        except Exception:
+            logger.exception("Warm-up prediction for %s failed", key)
+        self.loaded += 1
+
+    def _run(self):
+        start = time.perf_counter()
+        try:
+            self.registry.refresh()
+        except Exception as e:
+            # Seite trotzdem freigeben; die Registry versucht es beim nächsten Watcher-Lauf erneut
+            self.error = e
+            logger.exception("Model warm-up failed")
+        self.duration = time.perf_counter() - start
+        logger.info("Warmed up %d models in %.1fs", self.loaded, self.duration)
+        self._ready.set()
+        self.registry.start_watcher(self.reload_interval)
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    def wait(self, timeout=None):
+        return self._ready.wait(timeout)
@@ -0,0 +1,317 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+import requests
+
+from features import DEFAULT_WEATHER
+from mappings import coordinates_mapping, name_mapping, weather_code_mapping
+from singleflight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Stündliche Vorhersage, 3 Tage decken den 48-Stunden-Horizont ab
+CITY_CENTER = (51.0504, 13.7373)
+WEATHER_BASE_URL = "https://api.open-meteo.com/v1/forecast"
+WEATHER_PARAMS = (
+    "&hourly=temperature_2m,weathercode,precipitation,relativehumidity_2m"
+    "&forecast_days=3"
+    "&timezone=auto"
+)
+
+
+def weather_url(locations, base_url=WEATHER_BASE_URL):
+    # Eine Anfrage für beliebig viele Orte (lat, lon); bei mehr als einem liefert open-meteo eine Liste von Antworten
+    latitudes = ",".join(f"{lat:.4f}".rstrip("0").rstrip(".") for lat, _ in locations)
+    longitudes = ",".join(f"{lon:.4f}".rstrip("0").rstrip(".") for _, lon in locations)
+    return f"{base_url}?latitude={latitudes}&longitude={longitudes}{WEATHER_PARAMS}"
+
+
+WEATHER_URL = weather_url([CITY_CENTER])
+
+
+def lot_locations(keys):
+    # Parkplatz-Key -> (lat, lon) aus coordinates_mapping (dort als (lon, lat) hinterlegt)
+    locations = {}
+    for key in keys:
+        coords = coordinates_mapping.get(name_mapping.get(key, key))
+        if coords:
+            locations[key] = (coords[1], coords[0])
+    return locations
+
+
+def weather_cells(locations, cell_degrees):
+    # Parkplätze auf ein Raster mit cell_degrees Kantenlänge legen; pro Zelle wird nur einmal abgefragt.
+    # Zelle 0 ist die der Stadtmitte (auch für Parkplätze ohne Koordinaten); cell_degrees <= 0 -> nur diese.
+    def cell(lat, lon):
+        if cell_degrees <= 0:
+            return CITY_CENTER
+        return (round(round(lat / cell_degrees) * cell_degrees, 4), round(round(lon / cell_degrees) * cell_degrees, 4))
+
+    cells = [cell(*CITY_CENTER)]
+    lot_cells = {}
+    for key, (lat, lon) in locations.items():
+        center = cell(lat, lon)
+        if center not in cells:
+            cells.append(center)
+        lot_cells[key] = cells.index(center)
+    return cells, lot_cells
+
+
+FETCH_ERRORS = (requests.RequestException, ValueError)
+# Standardwert für snapshot in series/lookup: aktuellen Stand holen (None heißt dort "kein Wetter")
+_CURRENT = object()
+
+
+def fetch_weather(url=WEATHER_URL, timeout=None):
+    response = requests.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+# Wetter-Provider: fetch(locations, timeout) liefert eine open-meteo-Antwort pro Ort (lat, lon), in derselben
+# Reihenfolge. Neben open-meteo gibt es in weather_replay.py eine Wiedergabe aufgezeichneter Antworten und einen
+# lokalen HTTP-Stub (für Benchmarks und Tests ohne Netz).
+class OpenMeteoProvider:
+
+    def __init__(self, base_url=WEATHER_BASE_URL):
+        self.base_url = base_url
+
+    def fetch(self, locations, timeout=None):
+        data = fetch_weather(weather_url(locations, self.base_url), timeout)
+        return data if isinstance(data, list) else [data]
+
+    def __repr__(self):
+        return f"OpenMeteoProvider({self.base_url})"
+
+
+class WeatherSeries:
+    # open-meteo-Stundenreihe einmal geparst: Zeiten als datetime64 (Ortszeit wie geliefert, timezone=auto),
+    # Werte als float32. Abfragen per searchsorted für beliebig viele Zeitpunkte auf einmal; Temperatur,
+    # Luftfeuchtigkeit und Regen linear zwischen den vollen Stunden interpoliert, die Beschreibung von der
+    # angebrochenen Stunde. Außerhalb der Reihe (oder bei fehlenden Werten) gilt DEFAULT_WEATHER.
+
+    NUMERIC = {"temperature": "temperature_2m", "humidity": "relativehumidity_2m", "rain": "precipitation"}
+
+    def __init__(self, hourly):
+        self.times = np.array(hourly.get("time", []), dtype="datetime64[m]")
+        self.values = {name: np.array([np.nan if v is None else v for v in hourly.get(field, [])], dtype=np.float32)
+                       for name, field in self.NUMERIC.items()}
+        codes = hourly.get("weathercode", [])
+        self.description = np.array([weather_code_mapping.get(code, "Unknown") if code is not None else None
+                                     for code in codes], dtype=object)
+        if any(len(v) != len(self.times) for v in self.values.values()) or len(self.description) != len(self.times):
+            raise ValueError("Hourly weather series have different lengths")
+        self._minutes = self.times.astype(np.int64).astype(np.float64)
+
+    @classmethod
+    def from_response(cls, data):
+        return cls(data.get("hourly", {}) if data else {})
+
+    @staticmethod
+    def _minutes_of(times):
+        # tz-aware Zeitpunkte -> Wanduhrzeit in Minuten, wie die Zeitstempel von open-meteo
+        return np.array([np.datetime64(t.replace(tzinfo=None), "m") for t in times]).astype(np.int64).astype(np.float64)
+
+    def covers(self, times):
+        # True, wo ein Zeitpunkt innerhalb der Reihe liegt
+        minutes = self._minutes_of(times)
+        if not len(self._minutes):
+            return np.zeros(len(minutes), dtype=bool)
+        return (minutes >= self._minutes[0]) & (minutes <= self._minutes[-1])
+
+    def lookup(self, times):
+        # dict von Arrays (ein Wert pro Zeitpunkt) mit denselben Schlüsseln wie DEFAULT_WEATHER
+        minutes = self._minutes_of(times)
+        inside = self.covers(times)
+        columns = {}
+        for name, values in self.values.items():
+            column = np.full(len(minutes), DEFAULT_WEATHER[name], dtype=np.float64)
+            if inside.any():
+                column[inside] = np.interp(minutes[inside], self._minutes, values)
+            columns[name] = np.where(np.isnan(column), DEFAULT_WEATHER[name], column)
+        description = np.full(len(minutes), DEFAULT_WEATHER["description"], dtype=object)
+        if inside.any():
+            hour = np.searchsorted(self._minutes, minutes[inside], side="right") - 1
+            description[inside] = [d if d is not None else DEFAULT_WEATHER["description"] for d in self.description[hour]]
+        columns["description"] = description
+        return columns
+
+    def at(self, prediction_time):
+        # Wetter für einen Zeitpunkt als dict mit Python-Typen
+        return {name: values[0].item() if isinstance(values[0], np.generic) else values[0]
+                for name, values in self.lookup([prediction_time]).items()}
+
+
+@dataclass(frozen=True)
+class WeatherSnapshot:
+    data: list            # open-meteo-Antwort pro Zelle
+    series: tuple         # WeatherSeries pro Zelle
+    fetched_at: float     # time.time()
+    monotonic: float      # time.monotonic() beim Abruf
+    version: int          # zählt jeden erfolgreichen Abruf hoch
+
+
+class WeatherClient:
+    # Von allen Sessions geteilt: die letzte Antwort gilt ttl Sekunden. Danach wird sie weiter ausgeliefert und
+    # im Hintergrund neu geladen (stale-while-revalidate); nur solange es noch gar keine Antwort gibt, wartet die
+    # Seite auf den Abruf. Jeder Abruf hat ein hartes Timeout und wird mit exponentiellem Backoff wiederholt.
+    # Scheitert er, wird erst nach retry_after Sekunden wieder synchron geladen; bis dahin gilt Standardwetter.
+    # Mit start_prefetch erneuert ein Hintergrund-Thread die Antwort in festem Takt, bevor sie abläuft, und ist
+    # dann der einzige Schreiber. Gelesen wird immer self.snapshot – eine Zuweisung, daher ohne Lock.
+
+    # Mit locations (Parkplatz-Key -> (lat, lon)) gibt es Wetter pro Parkplatz: Parkplätze in derselben
+    # Rasterzelle teilen sich eine Reihe, alle Zellen kommen mit einer Anfrage.
+
+    def __init__(self, provider=None, ttl=600.0, timeout=5.0, retries=2, backoff=0.5, locations=None, cell_degrees=0.0,
+                 retry_after=60.0):
+        self.provider = provider or OpenMeteoProvider()
+        self.cells, self.lot_cells = weather_cells(locations or {}, cell_degrees)
+        self.ttl = ttl
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.retry_after = retry_after
+        self.snapshot = None
+        self._failed_at = None   # time.monotonic() des letzten gescheiterten Abrufs
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self._prefetcher = None
+        self._stop = threading.Event()
+        self.fetches = 0
+        self.failures = 0
+        self.stale_served = 0
+        self.skipped = 0
+        self.last_error = None
+        self._latencies = deque(maxlen=100)
+
+    def series(self, lot_key=None, snapshot=_CURRENT):
+        # Geparste Stundenreihe für den Parkplatz (ohne Key: Stadtmitte); leer -> überall Standardwetter.
+        # snapshot: Stand aus current(), damit ein Rerun alle Werte aus demselben Abruf nimmt
+        snapshot = self.current() if snapshot is _CURRENT else snapshot
+        return snapshot.series[self.lot_cells.get(lot_key, 0)] if snapshot is not None else WeatherSeries({})
+
+    def lookup(self, lot_keys, times, snapshot=_CURRENT):
+        # Wetter pro Parkplatz × Zeitpunkt: dict von Arrays der Form (len(lot_keys), len(times));
+        # jede Zelle wird nur einmal abgefragt
+        snapshot = self.current() if snapshot is _CURRENT else snapshot
+        cells = np.array([self.lot_cells.get(key, 0) for key in lot_keys], dtype=np.int64)
+        by_cell = {}
+        for cell in np.unique(cells):
+            series = snapshot.series[cell] if snapshot is not None else WeatherSeries({})
+            by_cell[cell] = series.lookup(times)
+        return {name: np.stack([by_cell[cell][name] for cell in cells]) if len(cells) else np.empty((0, len(times)))
+                for name in DEFAULT_WEATHER}
+
+    def current(self):
+        snapshot = self.snapshot
+        if snapshot is None:
+            failed_at = self._failed_at
+            if failed_at is not None and time.monotonic() - failed_at < self.retry_after:
+                # Quelle war eben nicht erreichbar -> nicht jede Seite durch alle Wiederholungen warten lassen
+                self.skipped += 1
+                return None
+            self.refresh()
+            return self.snapshot
+        if time.monotonic() - snapshot.monotonic >= self.ttl:
+            self.stale_served += 1
+            if self._prefetcher is None:
+                self._refresh_in_background()
+        return snapshot
+
+    def refresh(self):
+        # Blockierend; gleichzeitige Aufrufe teilen sich einen Abruf. None, wenn alle Versuche scheitern.
+        try:
+            return single_flight.do(("weather", id(self)), self._fetch)
+        except FETCH_ERRORS as e:
+            self._failed_at = time.monotonic()
+            logger.warning("Weather fetch failed, keeping previous forecast: %s", e)
+            return None
+
+    def start_prefetch(self, interval, jitter=0.0):
+        # Alle interval (+ zufällig bis jitter) Sekunden neu laden; interval < ttl, damit keine Seite je wartet
+        if self._prefetcher is not None or interval <= 0:
+            return self
+
+        def run():
+            while True:
+                try:
+                    self.refresh()
+                except Exception:
+                    logger.exception("Weather prefetch failed")
+                if self._stop.wait(interval + random.uniform(0, jitter)):
+                    return
+
+        self._prefetcher = threading.Thread(target=run, name="weather-prefetch", daemon=True)
+        self._prefetcher.start()
+        return self
+
+    def stop_prefetch(self):
+        self._stop.set()
+        if self._prefetcher is not None:
+            self._prefetcher.join()
+            self._prefetcher = None
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh()
+            finally:
+                self._refreshing = False
+
+        threading.Thread(target=run, name="weather-refresh", daemon=True).start()
+
+    def _fetch(self):
+        for attempt in range(self.retries + 1):
+            started = time.perf_counter()
+            self.fetches += 1
+            try:
+                data = responses = self.provider.fetch(self.cells, self.timeout)
+                # Einmal pro Abruf parsen, nicht pro Seite; eine Reihe pro Zelle
+                if len(responses) != len(self.cells):
+                    raise ValueError(f"Expected weather for {len(self.cells)} locations, got {len(responses)}")
+                series = tuple(WeatherSeries.from_response(response) for response in responses)
+            except FETCH_ERRORS as e:
+                self.failures += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                if attempt == self.retries:
+                    raise
+                time.sleep(self.backoff * 2 ** attempt)
+                continue
+            self._latencies.append(time.perf_counter() - started)
+            previous = self.snapshot
+            self.snapshot = WeatherSnapshot(data, series, time.time(), time.monotonic(),
+                                            previous.version + 1 if previous else 1)
+            self._failed_at = None
+            return data
+
+    def stats(self):
+        snapshot = self.snapshot
+        latencies = np.array(self._latencies) * 1000
+        return {
+            "age_seconds": time.monotonic() - snapshot.monotonic if snapshot is not None else None,
+            "fetched_at": snapshot.fetched_at if snapshot is not None else None,
+            "version": snapshot.version if snapshot is not None else None,
+            "ttl_seconds": self.ttl,
+            "provider": repr(self.provider),
+            "locations": len(self.cells),
+            "prefetch": self._prefetcher is not None,
+            "fetches": self.fetches,
+            "failures": self.failures,
+            "stale_served": self.stale_served,
+            "skipped_refreshes": self.skipped,
+            "retry_after_seconds": self.retry_after,
+            "latency_ms_last": float(latencies[-1]) if len(latencies) else None,
+            "latency_ms_mean": float(latencies.mean()) if len(latencies) else None,
+            "latency_ms_p95": float(np.percentile(latencies, 95)) if len(latencies) else None,
+            "last_error": self.last_error,
+        }
@@ -0,0 +1,161 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pytz
+
+from mappings import name_mapping
+from weather import OpenMeteoProvider, lot_locations, weather_cells
+
+logger = logging.getLogger(__name__)
+
+
+def record(path, locations, provider=None, timeout=30.0):
+    # Aktuelle Antworten für die Orte als Fixture speichern (Liste, wie open-meteo sie für mehrere Orte liefert)
+    responses = (provider or OpenMeteoProvider()).fetch(locations, timeout)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(responses, f)
+    return responses
+
+
+class ReplayProvider:
+    # Gibt aufgezeichnete open-meteo-Antworten wieder: pro angefragtem Ort die Antwort mit den nächstgelegenen
+    # Koordinaten. Mit shift_to_today werden die Zeitstempel um ganze Tage verschoben, damit die Reihe den
+    # aktuellen 48-Stunden-Horizont abdeckt (Tagesgang bleibt erhalten). latency simuliert langsame Antworten.
+
+    def __init__(self, path, shift_to_today=True, latency=0.0):
+        self.path = path
+        self.shift_to_today = shift_to_today
+        self.latency = latency
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.responses = data if isinstance(data, list) else [data]
+        if not self.responses:
+            raise ValueError(f"Weather fixture {path} is empty")
+        self.calls = 0
+
+    def fetch(self, locations, timeout=None):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._shifted(self._nearest(lat, lon)) for lat, lon in locations]
+
+    def _nearest(self, lat, lon):
+        def distance(response):
+            return (response.get("latitude", lat) - lat) ** 2 + (response.get("longitude", lon) - lon) ** 2
+        return min(self.responses, key=distance)
+
+    def _shifted(self, response):
+        times = response.get("hourly", {}).get("time", [])
+        if not self.shift_to_today or not times:
+            return response
+        recorded = np.array(times, dtype="datetime64[m]")
+        now = datetime.now(pytz.timezone(response.get("timezone", "Europe/Berlin"))).replace(tzinfo=None)
+        # So viele ganze Tage, dass die Reihe höchstens einen Tag vor jetzt beginnt
+        days = (np.datetime64(now, "m") - recorded[0]) // np.timedelta64(1, "D")
+        hourly = dict(response["hourly"], time=list((recorded + np.timedelta64(days, "D")).astype(str)))
+        return dict(response, hourly=hourly)
+
+    def __repr__(self):
+        return f"ReplayProvider({self.path})"
+
+
+class WeatherStubServer:
+    # Lokaler HTTP-Server mit open-meteo-kompatiblem /v1/forecast, beantwortet aus einem Provider (meist
+    # ReplayProvider). Mit OpenMeteoProvider(server.base_url) läuft der vollständige Abrufpfad (requests,
+    # Timeouts, Wiederholungen) ohne Netz; latency verzögert jede Antwort.
+
+    def __init__(self, provider, host="127.0.0.1", port=0, latency=0.0):
+        self.provider = provider
+        self.latency = latency
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="weather-stub", daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/forecast"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path != "/v1/forecast":
+                    self.send_error(404)
+                    return
+                query = parse_qs(url.query)
+                try:
+                    latitudes = [float(v) for v in query["latitude"][0].split(",")]
+                    longitudes = [float(v) for v in query["longitude"][0].split(",")]
+                    if len(latitudes) != len(longitudes):
+                        raise ValueError("latitude and longitude differ in length")
+                except (KeyError, ValueError) as e:
+                    self.send_error(400, str(e))
+                    return
+                stub.requests += 1
+                if stub.latency:
+                    time.sleep(stub.latency)
+                responses = stub.provider.fetch(list(zip(latitudes, longitudes)))
+                body = json.dumps(responses if len(responses) > 1 else responses[0]).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("weather stub: " + format, *args)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record open-meteo responses as a fixture or serve a fixture locally")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("record", help="fetch the forecast for all lot grid cells and save it as a fixture")
+    rec.add_argument("--out", default="weather_fixture.json")
+    rec.add_argument("--cell-degrees", type=float, default=0.02,
+                     help="same value as PARKING_WEATHER_CELL_DEGREES, so replay matches every cell exactly")
+    serve = sub.add_parser("serve", help="serve a fixture as an open-meteo compatible HTTP endpoint")
+    serve.add_argument("fixture")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    serve.add_argument("--no-shift", action="store_true", help="keep the recorded timestamps")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        cells, _ = weather_cells(lot_locations(name_mapping), args.cell_degrees)
+        record(args.out, cells)
+        print(f"{args.out}: {len(cells)} locations")
+    else:
+        server = WeatherStubServer(ReplayProvider(args.fixture, not args.no_shift), args.host, args.port, args.latency)
+        print(f"Serving {args.fixture} at {server.base_url} (set PARKING_WEATHER_BASE_URL to this URL)")
+        server.start()
+        try:
+            server._thread.join()
+        except KeyboardInterrupt:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()